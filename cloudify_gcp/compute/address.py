@@ -13,7 +13,6 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
-import time
 from os.path import basename
 
 from cloudify import ctx
@@ -31,6 +30,7 @@ class Address(GoogleCloudPlatform):
     In the API these only differ in that Address requires a
     region, while GlobalAddress does not accept one.
     """
+    FIELDS = 'id,name,selfLink,address,region,status'
 
     def __init__(self,
                  config,
@@ -64,9 +64,10 @@ class Address(GoogleCloudPlatform):
         return args
 
     @check_response
-    def get(self):
+    def get(self, fields=None):
         return self._get_resource_type().get(
             address=self.name,
+            fields=fields,
             **self._common_kwargs()).execute()
 
     @utils.async_operation(get=True)
@@ -127,8 +128,7 @@ def delete(**kwargs):
 
 
 def get_reserved_ip_address(static_ip):
-    while True:
-        response = static_ip.get()
-        if response.get('address'):
-            return response.get('address')
-        time.sleep(2)
+    response = utils.Poller.from_config(static_ip.config).poll(
+        static_ip.get,
+        lambda response: response.get('address'))
+    return response['address']
@@ -0,0 +1,162 @@
+# #######
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+from os.path import basename
+
+from cloudify import ctx
+from cloudify.decorators import operation
+from cloudify.exceptions import NonRecoverableError
+
+from .. import utils
+from ..gcp import check_response
+from ..gcp import GoogleCloudPlatform
+
+
+class Autoscaler(GoogleCloudPlatform):
+    """
+    Resizes a managed instance group according to its policy.
+
+    Like the groups they scale, autoscalers are regional when a region is
+    given and zonal otherwise.
+    """
+    FIELDS = 'id,name,selfLink,zone,region,target,autoscalingPolicy'
+
+    def __init__(self,
+                 config,
+                 logger,
+                 name,
+                 additional_settings=None,
+                 target=None,
+                 policy=None,
+                 zone=None,
+                 region=None,
+                 ):
+        """
+        Create Autoscaler object
+
+        :param config: gcp auth file
+        :param logger: logger object
+        :param name: name of the autoscaler
+        :param target: URL of the managed instance group to scale
+        :param policy: autoscalingPolicy, e.g.
+        {'minNumReplicas': 1, 'maxNumReplicas': 10,
+         'cpuUtilization': {'utilizationTarget': 0.6}}
+        :param zone: zone of a zonal autoscaler, default the configured zone
+        :param region: region of a regional autoscaler
+        """
+        super(Autoscaler, self).__init__(
+            config,
+            logger,
+            utils.get_gcp_resource_name(name),
+            additional_settings)
+        self.target = target
+        self.policy = policy or {}
+        if zone:
+            self.zone = zone
+        self.region = region
+
+    def _get_resource_type(self):
+        if self.region:
+            return self.discovery.regionAutoscalers()
+        return self.discovery.autoscalers()
+
+    def _common_kwargs(self):
+        args = {'project': self.project}
+        if self.region:
+            args['region'] = basename(self.region)
+        else:
+            args['zone'] = basename(self.zone)
+        return args
+
+    def to_dict(self):
+        self.body.update({
+            'description': 'Cloudify generated autoscaler',
+            'name': self.name,
+            'target': self.target,
+            'autoscalingPolicy': self.policy,
+        })
+        return self.body
+
+    @check_response
+    def get(self, fields=None):
+        return self._get_resource_type().get(
+            autoscaler=self.name,
+            fields=fields,
+            **self._common_kwargs()).execute()
+
+    def list(self, **kwargs):
+        kwargs.update(self._common_kwargs())
+        return self.list_items(self._get_resource_type(), **kwargs)
+
+    @utils.async_operation(get=True)
+    @check_response
+    def create(self):
+        return self._get_resource_type().insert(
+            body=self.to_dict(),
+            **self._common_kwargs()).execute()
+
+    @utils.async_operation()
+    @check_response
+    def delete(self):
+        return self._get_resource_type().delete(
+            autoscaler=self.name,
+            **self._common_kwargs()).execute()
+
+
+@operation
+@utils.throw_cloudify_exceptions
+def create(name, policy, additional_settings, **kwargs):
+    name = utils.get_final_resource_name(name)
+    gcp_config = utils.get_gcp_config()
+
+    rels = utils.get_relationships(
+            ctx,
+            filter_relationships='cloudify.gcp.relationships.'
+                                 'autoscaler_connected_to_instance_group',
+            )
+    if len(rels) != 1:
+        raise NonRecoverableError(
+                'An autoscaler must be connected to exactly one '
+                'ManagedInstanceGroup')
+    group = rels[0].target.instance.runtime_properties
+
+    autoscaler = Autoscaler(
+            gcp_config,
+            ctx.logger,
+            name=name,
+            target=group['selfLink'],
+            policy=policy,
+            zone=group.get('zone'),
+            region=group.get('region'),
+            additional_settings=additional_settings,
+            )
+
+    utils.create(autoscaler)
+
+
+@operation
+@utils.retry_on_failure('Retrying deleting autoscaler')
+@utils.throw_cloudify_exceptions
+def delete(**kwargs):
+    gcp_config = utils.get_gcp_config()
+    props = ctx.instance.runtime_properties
+    if props.get('name'):
+        autoscaler = Autoscaler(
+                gcp_config,
+                ctx.logger,
+                name=props['name'],
+                zone=props.get('zone'),
+                region=props.get('region'),
+                )
+        utils.delete_if_not_external(autoscaler)
@@ -27,6 +27,7 @@ from ..gcp import (
 
 
 class BackendService(GoogleCloudPlatform):
+    FIELDS = 'id,name,selfLink,backends,healthChecks'
 
     def __init__(self,
                  config,
@@ -58,15 +59,15 @@ class BackendService(GoogleCloudPlatform):
         return 'global/backendServices/{0}'.format(self.name)
 
     @check_response
-    def get(self):
+    def get(self, fields=None):
         return self.discovery.backendServices().get(
             project=self.project,
-            backendService=self.name).execute()
+            backendService=self.name,
+            fields=fields).execute()
 
-    @check_response
-    def list(self):
-        return self.discovery.backendServices().list(
-            project=self.project).execute()
+    def list(self, **kwargs):
+        return self.list_items(
+            self.discovery.backendServices(), project=self.project, **kwargs)
 
     @utils.async_operation(get=True)
     @check_response
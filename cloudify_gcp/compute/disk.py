@@ -62,11 +62,12 @@ class Disk(GoogleCloudPlatform):
             zone=self.zone,
             disk=self.name).execute()
 
-    @check_response
-    def list(self):
-        return self.discovery.disks().list(
+    def list(self, **kwargs):
+        return self.list_items(
+            self.discovery.disks(),
             project=self.project,
-            zone=self.zone).execute()
+            zone=self.zone,
+            **kwargs)
 
     @check_response
     def create(self):
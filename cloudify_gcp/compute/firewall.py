@@ -13,6 +13,8 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
+from os.path import basename
+
 from cloudify import ctx
 from cloudify.decorators import operation
 
@@ -74,6 +76,9 @@ class FirewallRule(GoogleCloudPlatform):
         :return: REST response with operation responsible for the firewall rule
         creation process and its status
         """
+        return self.create_request().execute()
+
+    def create_request(self):
         self.logger.info(
             'Create firewall rule {0} in network {1}'.format(
                 self.name,
@@ -81,7 +86,7 @@ class FirewallRule(GoogleCloudPlatform):
 
         return self.discovery.firewalls().insert(
             project=self.project,
-            body=self.to_dict()).execute()
+            body=self.to_dict())
 
     @check_response
     def delete(self):
@@ -92,6 +97,9 @@ class FirewallRule(GoogleCloudPlatform):
         :return: REST response with operation responsible for the firewall rule
         deletion process and its status
         """
+        return self.delete_request().execute()
+
+    def delete_request(self):
         self.logger.info(
             'Delete firewall rule {0} from network {1}'.format(
                 self.name,
@@ -99,21 +107,26 @@ class FirewallRule(GoogleCloudPlatform):
 
         return self.discovery.firewalls().delete(
             project=self.project,
-            firewall=self.name).execute()
+            firewall=self.name)
 
     @check_response
-    def get(self):
+    def get(self, fields=None):
         """
         Get GCP firewall rule details.
 
+        :param fields: fields of the firewall rule to fetch, default all
         :return: REST response with operation responsible for the firewall
         rule details retrieval
         """
+        return self.get_request(fields).execute()
+
+    def get_request(self, fields=None):
         self.logger.info('Get firewall rule {0} details'.format(self.name))
 
         return self.discovery.firewalls().get(
             project=self.project,
-            firewall=self.name).execute()
+            firewall=self.name,
+            fields=fields)
 
     @check_response
     def update(self):
@@ -129,20 +142,60 @@ class FirewallRule(GoogleCloudPlatform):
         return self.discovery.firewalls().update(
             project=self.project,
             firewall=self.name,
-            body=self.firewall).execute()
+            body=self.to_dict()).execute()
 
+    @utils.async_operation(get=True)
     @check_response
-    def list(self):
+    def patch(self, changes=None):
+        """
+        Change some fields of GCP firewall rule, leaving the rest as they are.
+        Global operation.
+
+        :param changes: fields to change, by default all from to_dict
+        :return: REST response with operation responsible for the firewall rule
+        patch process and its status
+        """
+        return self.patch_request(changes).execute()
+
+    def patch_request(self, changes=None):
+        if changes is None:
+            changes = {key: value for key, value in self.to_dict().items()
+                       if key != 'name'}
+        self.logger.info('Patch firewall rule {0} fields {1}'.format(
+            self.name, sorted(changes)))
+
+        return self.discovery.firewalls().patch(
+            project=self.project,
+            firewall=self.name,
+            body=changes)
+
+    def diff(self, current):
+        """
+        Compare the firewall rule described by this object with `current`.
+
+        :param current: the firewall rule as returned by get
+        :return: fields of to_dict which differ from `current`
+        """
+        desired = dict(self.to_dict())
+        desired.setdefault('targetTags', [])
+        return {
+            key: value for key, value in desired.items()
+            if key != 'name' and
+            normalize_field(key, value) !=
+            normalize_field(key, current.get(key))}
+
+    def list(self, **kwargs):
         """
         List GCP firewall rules in all networks.
 
-        :return: REST response with list of firewall rules in a project
+        :param kwargs: see GoogleCloudPlatform.list_items
+        :return: generator of the firewall rules in the project
         """
         self.logger.info(
             'List firewall rules in project {0}'.format(self.project))
 
-        return self.discovery.firewalls().list(
-            project=self.project).execute()
+        return self.list_items(
+            self.discovery.firewalls(), project=self.project, **kwargs)
 
     def to_dict(self):
         self.body.update({
@@ -174,6 +227,26 @@ class FirewallRule(GoogleCloudPlatform):
         return self.body
 
 
+def normalize_field(key, value):
+    """
+    Put a firewall rule field into a form which can be compared without
+    differences in ordering, or in how GCP reports it, showing up as changes.
+    """
+    if not value:
+        # GCP leaves out empty fields
+        return None
+    if key == 'network':
+        return basename(value)
+    if key == 'allowed':
+        return sorted(
+            (rule['IPProtocol'],
+             sorted(str(port) for port in rule.get('ports', [])))
+            for rule in value)
+    if isinstance(value, list):
+        return sorted(value)
+    return value
+
+
 @operation
 @utils.throw_cloudify_exceptions
 def create(name, allowed, sources, target_tags, additional_settings, **kwargs):
@@ -209,3 +282,33 @@ def delete(**kwargs):
                                 network=network)
         utils.delete_if_not_external(firewall)
         ctx.instance.runtime_properties.pop('name')
+
+
+@operation
+@utils.throw_cloudify_exceptions
+def update(allowed, sources, target_tags, additional_settings, **kwargs):
+    """
+    Bring the firewall rule into line with the given properties, changing
+    only the fields which differ from the existing rule
+    """
+    gcp_config = utils.get_gcp_config()
+    props = ctx.instance.runtime_properties
+    firewall = FirewallRule(gcp_config,
+                            ctx.logger,
+                            network=utils.get_network(ctx),
+                            name=props['name'],
+                            allowed=allowed,
+                            sources=sources,
+                            tags=target_tags,
+                            additional_settings=additional_settings,
+                            )
+
+    changes = None
+    if not props.get('_operation'):
+        changes = firewall.diff(firewall.get())
+        if not changes:
+            ctx.logger.info(
+                'Firewall rule {0} is already up to date'.format(
+                    firewall.name))
+            return
+    firewall.patch(changes)
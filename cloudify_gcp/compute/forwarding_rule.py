@@ -28,6 +28,8 @@ from ..gcp import (
 
 class BaseForwardingRule(GoogleCloudPlatform):
     __metaclass__ = ABCMeta
+    FIELDS = ('id,name,selfLink,region,IPAddress,IPProtocol,portRange,'
+              'target')
 
     def __init__(self,
                  config,
@@ -61,15 +63,15 @@ class BaseForwardingRule(GoogleCloudPlatform):
         return self.body
 
     @check_response
-    def get(self):
+    def get(self, fields=None):
         return self._get_endpoint().get(
             project=self.project,
-            forwardingRule=self.name).execute()
+            forwardingRule=self.name,
+            fields=fields).execute()
 
-    @check_response
-    def list(self):
-        return self._get_endpoint().list(
-            project=self.project).execute()
+    def list(self, **kwargs):
+        return self.list_items(
+            self._get_endpoint(), project=self.project, **kwargs)
 
     @utils.async_operation(get=True)
     @check_response
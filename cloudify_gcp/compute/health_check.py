@@ -27,6 +27,7 @@ from cloudify_gcp.gcp import check_response
 
 class HealthCheck(GoogleCloudPlatform):
     __metaclass__ = ABCMeta
+    FIELDS = 'id,name,selfLink,kind,port,requestPath'
 
     def __init__(self,
                  config,
@@ -51,10 +52,11 @@ class HealthCheck(GoogleCloudPlatform):
         return body
 
     @check_response
-    def get(self):
+    def get(self, fields=None):
         kwargs = {
             'project': self.project,
-            self.name_keyword: self.name
+            self.name_keyword: self.name,
+            'fields': fields,
         }
         return self._gcp_health_checks().get(**kwargs).execute()
 
@@ -65,9 +67,9 @@ class HealthCheck(GoogleCloudPlatform):
             project=self.project,
             body=self.to_dict()).execute()
 
-    @check_response
-    def list(self):
-        return self._gcp_health_checks().list(project=self.project).execute()
+    def list(self, **kwargs):
+        return self.list_items(
+            self._gcp_health_checks(), project=self.project, **kwargs)
 
     @utils.async_operation()
     @check_response
@@ -12,14 +12,27 @@
 #    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
+import os
+import re
+import tarfile
+import urllib2
+import zlib
+from contextlib import closing
+
 from cloudify import ctx
 from cloudify.decorators import operation
+from cloudify.exceptions import NonRecoverableError
+from googleapiclient.errors import HttpError
 
+from cloudify_gcp.gcp import GCPError
 from cloudify_gcp.gcp import GoogleCloudPlatform
 from cloudify_gcp.gcp import check_response
+from cloudify_gcp.gcp import is_missing_resource_error
 from .. import constants
 from .. import utils
+from cloudify_gcp.storage import MD5_METADATA_KEY
 from cloudify_gcp.storage import Object
+from cloudify_gcp.storage import file_md5
 
 
 class Image(GoogleCloudPlatform):
@@ -58,11 +71,65 @@ class Image(GoogleCloudPlatform):
         return self.discovery.images().insert(project=self.project,
                                               body=self.to_dict()).execute()
 
-    def upload_and_create(self, file_path):
+    def upload_and_create(self, file_path, session=None, checkpoint=None):
+        """
+        Upload the image tar.gz at `file_path` and create the image from it.
+
+        If the bucket already has an identical tar.gz it isn't uploaded
+        again, and if the image was already created from it, it isn't
+        created again either.
+
+        :param session: see Object.upload
+        :param checkpoint: see Object.upload
+        """
+        md5 = file_md5(file_path)
+        obj = Object(self.config, self.logger, '{0}.tar.gz'.format(self.name),
+                     metadata={MD5_METADATA_KEY: md5})
+
+        if obj.content_md5() == md5:
+            self.logger.info(
+                '{0} is already uploaded, with the same content'.format(
+                    obj.name))
+            self.url = obj.get(fields='selfLink')['selfLink']
+            if self.created_from(self.url):
+                self.logger.info(
+                    'Image {0} already exists'.format(self.name))
+                return
+        else:
+            self.url = obj.upload_to_bucket(path=file_path,
+                                            session=session,
+                                            checkpoint=checkpoint)
+        self.create()
+
+    def stream_and_create(self, source, session=None, checkpoint=None):
+        """
+        Package the raw disk image at `source` into the tar.gz GCE needs
+        while uploading it, and create the image from it.
+
+        :param source: local path or http(s) URL of the raw disk image
+        :param session: see Object.upload
+        :param checkpoint: see Object.upload
+        """
+        chunks, size = read_raw_image(source)
         obj = Object(self.config, self.logger, '{0}.tar.gz'.format(self.name))
-        self.url = obj.upload_to_bucket(path=file_path)
+        self.url = obj.upload_stream(
+            tar_gz_stream(chunks, size),
+            session=session,
+            checkpoint=checkpoint)
         self.create()
 
+    def created_from(self, url):
+        """
+        :return: whether this image exists and was created from `url`
+        """
+        try:
+            image = self.get()
+        except HttpError as e:
+            if is_missing_resource_error(e):
+                return False
+            raise
+        return image.get('rawDisk', {}).get('source') == url
+
     @check_response
     def get(self):
         return self.discovery.images().get(project=self.project,
@@ -73,17 +140,16 @@ class Image(GoogleCloudPlatform):
         return self.discovery.images().delete(project=self.project,
                                               image=self.name).execute()
 
-    def list(self):
-        image_list = self.discovery.images().list(
-                project=self.project).execute()
-        return image_list['items']
+    def list(self, **kwargs):
+        return self.list_items(
+            self.discovery.images(), project=self.project, **kwargs)
 
-    def list_objects(self):
-        storage = self.create_discovery(discovery=constants.STORAGE_DISCOVERY,
-                                        scope=constants.STORAGE_SCOPE_RW,
-                                        api_version=constants.API_V1)
-        response = storage.objects().list(bucket=self.project).execute()
-        return response.get('items')
+    def list_objects(self, **kwargs):
+        storage = self.get_discovery(discovery=constants.STORAGE_DISCOVERY,
+                                     scope=constants.STORAGE_SCOPE_RW,
+                                     api_version=constants.API_V1)
+        return self.list_items(
+            storage.objects(), bucket=self.project, **kwargs)
 
     def to_dict(self):
         self.body.update({
@@ -96,20 +162,98 @@ class Image(GoogleCloudPlatform):
         return self.body
 
 
+def read_raw_image(source):
+    """
+    Open the raw disk image at `source`, which is a local path or an http(s)
+    URL.
+
+    :return: (generator of the image's content, size of the image)
+    """
+    if re.match(r'^https?://', source):
+        image_file = urllib2.urlopen(source)
+        size = image_file.info().getheader('Content-Length')
+        if size is None:
+            image_file.close()
+            raise NonRecoverableError(
+                'The server did not give the size of {0}'.format(source))
+        size = int(size)
+    else:
+        image_file = open(source, 'rb')
+        size = os.fstat(image_file.fileno()).st_size
+
+    def read():
+        with closing(image_file):
+            for block in iter(lambda: image_file.read(constants.CHUNKSIZE),
+                              b''):
+                yield block
+
+    return read(), size
+
+
+def tar_gz_stream(chunks, size, name='disk.raw'):
+    """
+    Generate a gzipped tar archive holding a single file, in the format GCE
+    imports images from.
+
+    The output only depends on the content, so that an interrupted upload
+    can be resumed by generating the archive again.
+
+    :param chunks: iterable of the file's content
+    :param size: size of the file
+    :param name: name of the file in the archive
+    """
+    # A gzip wrapper written by zlib has no timestamp
+    compressor = zlib.compressobj(
+        zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mode = 0o644
+    yield compressor.compress(info.tobuf(format=tarfile.GNU_FORMAT))
+
+    written = 0
+    for chunk in chunks:
+        written += len(chunk)
+        yield compressor.compress(chunk)
+    if written != size:
+        raise GCPError(
+            'Expected {0} bytes of {1}, but got {2}'.format(
+                size, name, written))
+
+    # Pad the file to a whole block, then end the archive with two empty
+    # blocks
+    yield compressor.compress(
+        b'\0' * (-size % tarfile.BLOCKSIZE + 2 * tarfile.BLOCKSIZE))
+    yield compressor.flush()
+
+
 @operation
 @utils.throw_cloudify_exceptions
-def create(image_name, image_path, additional_settings, **kwargs):
+def create(image_name, image_path, additional_settings, raw_image=None,
+           **kwargs):
     gcp_config = utils.get_gcp_config()
     name = utils.get_final_resource_name(image_name)
     image = Image(gcp_config, ctx.logger, name, additional_settings)
-    upload_image(image, image_path)
+    upload_image(image, image_path, raw_image)
     ctx.instance.runtime_properties['name'] = image.name
 
 
 @utils.create_resource
-def upload_image(image, image_path):
-    local_path = ctx.download_resource(image_path)
-    image.upload_and_create(local_path)
+def upload_image(image, image_path, raw_image=None):
+    props = ctx.instance.runtime_properties
+    session = props.get('_upload', {})
+
+    def checkpoint():
+        # Saved straight away so that a retry resumes the upload
+        props['_upload'] = session
+        ctx.instance.update()
+
+    if raw_image:
+        image.stream_and_create(raw_image, session, checkpoint)
+    else:
+        local_path = ctx.download_resource(image_path)
+        image.upload_and_create(local_path, session, checkpoint)
+    props.pop('_upload', None)
 
 
 @operation
@@ -13,7 +13,9 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
+import json
 import random
+import threading
 from os.path import basename
 
 from cloudify import ctx
@@ -34,6 +36,9 @@ class Instance(GoogleCloudPlatform):
     ACCESS_CONFIG = 'External NAT'
     ACCESS_CONFIG_TYPE = 'ONE_TO_ONE_NAT'
     NETWORK_INTERFACE = 'nic0'
+    FIELDS = ('id,name,selfLink,zone,status,tags,'
+              'networkInterfaces(network,subnetwork,networkIP,'
+              'accessConfigs(name,natIP))')
     STANDARD_MACHINE_TYPE = 'n1-standard-1'
     DEFAULT_SCOPES = ['https://www.googleapis.com/auth/devstorage.read_write',
                       'https://www.googleapis.com/auth/logging.write']
@@ -54,6 +59,8 @@ class Instance(GoogleCloudPlatform):
                  subnetwork=None,
                  zone=None,
                  can_ip_forward=False,
+                 bulk=False,
+                 source_instance_template=None,
                  ):
         """
         Create Instance object
@@ -67,6 +74,10 @@ class Instance(GoogleCloudPlatform):
         default None
         :param external_ip: boolean external ip indicator, default False
         :param tags: tags for the instance, default []
+        :param bulk: create the instance together with others of the same
+        shape using instances.bulkInsert, default False
+        :param source_instance_template: URL of an instance template to
+        create the instance from, default None
         """
         super(Instance, self).__init__(
             config,
@@ -85,6 +96,8 @@ class Instance(GoogleCloudPlatform):
         self.network = network
         self.subnetwork = subnetwork
         self.can_ip_forward = can_ip_forward
+        self.bulk = bulk
+        self.source_instance_template = source_instance_template
 
     @utils.async_operation(get=True)
     @check_response
@@ -102,13 +115,38 @@ class Instance(GoogleCloudPlatform):
         disk = ctx.instance.runtime_properties.get(constants.DISK)
         if disk:
             self.disks = [disk]
-        if not self.disks and not self.image:
+        if not any([self.disks, self.image, self.source_instance_template]):
             raise NonRecoverableError("A disk image ID must be provided")
 
+        # bulkInsert creates every boot disk from the shared properties, so
+        # an instance with a disk of its own has to be inserted by itself
+        if self.bulk and not self.disks:
+            return bulk_insert.insert(self)
+
+        return self.insert_request().execute()
+
+    def insert_request(self):
+        """
+        Unexecuted request creating the instance.
+
+        Instances created from a template only send their name (and boot
+        disk, if they have one of their own), the rest of the body comes
+        from the template.
+        """
+        if self.source_instance_template:
+            body = {'name': self.name}
+            if self.disks:
+                body['disks'] = self.disks
+            return self.discovery.instances().insert(
+                project=self.project,
+                zone=basename(self.zone),
+                sourceInstanceTemplate=self.source_instance_template,
+                body=body)
+
         return self.discovery.instances().insert(
             project=self.project,
             zone=basename(self.zone),
-            body=self.to_dict()).execute()
+            body=self.to_dict())
 
     @utils.async_operation()
     @check_response
@@ -149,6 +187,13 @@ class Instance(GoogleCloudPlatform):
             instance=self.name,
             body={'items': self.tags, 'fingerprint': fingerprint}).execute()
 
+    @utils.sync_operation
+    def add_name_tag(self):
+        """
+        Tag the instance with its own name, and wait for it to be applied.
+        """
+        return self.set_tags([self.name])
+
     @check_response
     def remove_tags(self, tags):
         """
@@ -175,10 +220,12 @@ class Instance(GoogleCloudPlatform):
             body={'items': self.tags, 'fingerprint': fingerprint}).execute()
 
     @check_response
-    def get(self):
+    def get(self, fields=None):
         """
         Get GCP instance details.
 
+        :param fields: fields to fetch, e.g. self.FIELDS. All fields are
+        fetched by default
         :return: REST response with operation responsible for the instance
         details retrieval
         """
@@ -187,7 +234,8 @@ class Instance(GoogleCloudPlatform):
         return self.discovery.instances().get(
             instance=self.name,
             project=self.project,
-            zone=basename(self.zone)).execute()
+            zone=basename(self.zone),
+            fields=fields).execute()
 
     @check_response
     def add_access_config(self, ip_address=''):
@@ -262,19 +310,21 @@ class Instance(GoogleCloudPlatform):
             instance=self.name,
             deviceName=disk_name).execute()
 
-    @check_response
-    def list(self):
+    def list(self, **kwargs):
         """
         List GCP instances.
         Zone operation.
 
-        :return: REST response with a list of instances and its details
+        :param kwargs: see GoogleCloudPlatform.list_items
+        :return: generator of the instances in the zone
         """
         self.logger.info('List instances in project {0}'.format(self.project))
 
-        return self.discovery.instances().list(
+        return self.list_items(
+            self.discovery.instances(),
             project=self.project,
-            zone=basename(self.zone)).execute()
+            zone=basename(self.zone),
+            **kwargs)
 
     def to_dict(self):
         def add_key_value_to_metadata(key, value, body):
@@ -333,6 +383,127 @@ class Instance(GoogleCloudPlatform):
 
         return self.body
 
+    def to_properties(self):
+        """
+        The parts of the instance's body which aren't specific to it, in the
+        form used by instance templates and bulkInsert requests.
+        """
+        properties = dict(self.to_dict())
+        del properties['name']
+        properties['machineType'] = basename(properties['machineType'])
+        properties['tags'] = {'items': sorted(
+            tag for tag in properties['tags']['items']
+            if tag != self.name)}
+        return properties
+
+
+class BulkInsert(object):
+    """
+    Coalesces Instance inserts made by tasks running concurrently in this
+    process into instances.bulkInsert requests.
+
+    Instances whose bodies only differ by name, or which are created from
+    the same template, share a request. The first task to queue an instance
+    of a given shape waits up to `window` seconds for others to join it,
+    then sends the request on behalf of all of them. Every member gets the
+    same operation back, so each node instance waits on it and then reads
+    its own instance as usual.
+
+    Instances created together share one set of properties, so they aren't
+    tagged with their own name until `start` adds it. Instances with a boot
+    disk of their own are never sent here.
+    """
+
+    def __init__(self,
+                 window=constants.BULK_INSERT_WINDOW,
+                 max_count=constants.BULK_INSERT_MAX_COUNT):
+        self.window = window
+        self.max_count = max_count
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def insert(self, instance):
+        """
+        Queue `instance` for creation.
+
+        :return: REST response with the operation creating the instance
+        """
+        if instance.source_instance_template:
+            properties = {
+                'sourceInstanceTemplate': instance.source_instance_template}
+        else:
+            properties = instance.to_properties()
+        key = (
+            instance.project,
+            basename(instance.zone),
+            json.dumps(properties, sort_keys=True),
+            )
+
+        with self._lock:
+            group = self._pending.get(key)
+            leader = group is None
+            if leader:
+                group = self._pending[key] = _BulkInsertGroup(
+                    instance, properties)
+            group.names.append(instance.name)
+            if len(group.names) >= self.max_count:
+                del self._pending[key]
+                group.full.set()
+
+        if leader:
+            group.full.wait(self.window)
+            with self._lock:
+                if self._pending.get(key) is group:
+                    del self._pending[key]
+            group.send()
+        else:
+            group.done.wait()
+
+        if group.error is not None:
+            raise group.error
+        return group.response
+
+
+class _BulkInsertGroup(object):
+
+    def __init__(self, instance, properties):
+        self.instance = instance
+        self.properties = properties
+        self.names = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+    def send(self):
+        try:
+            if len(self.names) == 1:
+                self.response = self.instance.insert_request().execute()
+            else:
+                self.instance.logger.info(
+                    'Creating {0} instances in one request'.format(
+                        len(self.names)))
+                body = {
+                    'count': len(self.names),
+                    'perInstanceProperties': {
+                        name: {} for name in self.names},
+                    }
+                if 'sourceInstanceTemplate' in self.properties:
+                    body.update(self.properties)
+                else:
+                    body['instanceProperties'] = self.properties
+                self.response = self.instance.discovery.instances().bulkInsert(
+                    project=self.instance.project,
+                    zone=basename(self.instance.zone),
+                    body=body).execute()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+
+bulk_insert = BulkInsert()
+
 
 @operation
 @utils.throw_cloudify_exceptions
@@ -346,22 +517,12 @@ def create(instance_type,
            zone=None,
            can_ip_forward=False,
            additional_settings=None,
+           bulk_create=False,
            **kwargs):
     props = ctx.instance.runtime_properties
     gcp_config = utils.get_gcp_config()
 
-    script = ''
-
-    if startup_script:
-        if startup_script.get('type') == 'file':
-            script = ctx.get_resource(startup_script.get('script'))
-        elif startup_script.get('type') == 'string':
-            script = startup_script.get('script')
-        else:
-            raise NonRecoverableError(
-                'invalid script type: {}'.format(startup_script.get('type')))
-    ctx.logger.info('The script is {0}'.format(str(startup_script)))
-
+    script = get_startup_script(startup_script)
     ssh_keys = get_ssh_keys()
 
     network, subnetwork = utils.get_net_and_subnet(ctx)
@@ -379,6 +540,16 @@ def create(instance_type,
             zone = props['zone'] = utils.get_gcp_resource_name(
                     gcp_config['zone'])
 
+    template = None
+    template_rels = utils.get_relationships(
+            ctx,
+            filter_relationships='cloudify.gcp.relationships.'
+                                 'instance_created_from_template',
+            )
+    if template_rels:
+        template = template_rels[0].target.instance.runtime_properties[
+                'selfLink']
+
     instance_name = utils.get_final_resource_name(name)
     instance = Instance(
             gcp_config,
@@ -396,6 +567,8 @@ def create(instance_type,
             zone=zone,
             can_ip_forward=can_ip_forward,
             additional_settings=additional_settings,
+            bulk=bulk_create,
+            source_instance_template=template,
             )
 
     utils.create(instance)
@@ -411,6 +584,14 @@ def start(**kwargs):
                         name=props['name'],
                         zone=basename(props['zone']),
                         )
+
+    # Instances created by a bulkInsert request or from a template don't get
+    # their own name as a tag when they are created
+    tags = props.get('tags')
+    if tags is not None and instance.name not in tags.get('items', []):
+        instance.add_name_tag()
+        props['tags'] = {'items': sorted(instance.tags)}
+
     set_ip(instance)
 
 
@@ -571,10 +752,7 @@ def set_ip(instance, relationship=False):
     else:
         props = ctx.instance.runtime_properties
 
-    instances = instance.list()
-    item = utils.get_item_from_gcp_response('name',
-                                            instance.name,
-                                            instances)
+    item = instance.get(fields=instance.FIELDS)
 
     try:
         if relationship or ctx.node.properties['external_ip']:
@@ -589,9 +767,25 @@ def set_ip(instance, relationship=False):
                 'The instance has not yet created network interface', 10)
 
 
+def get_startup_script(startup_script):
+    script = ''
+
+    if startup_script:
+        if startup_script.get('type') == 'file':
+            script = ctx.get_resource(startup_script.get('script'))
+        elif startup_script.get('type') == 'string':
+            script = startup_script.get('script')
+        else:
+            raise NonRecoverableError(
+                'invalid script type: {}'.format(startup_script.get('type')))
+    ctx.logger.info('The script is {0}'.format(str(startup_script)))
+
+    return script
+
+
 def get_ssh_keys():
     instance_keys = ctx.instance.runtime_properties.get(constants.SSH_KEYS, [])
-    install = ctx.node.properties['install_agent']
+    install = ctx.node.properties.get('install_agent')
     # properties['install_agent'] defaults to '', but that means true!
     agent_config = ctx.node.properties.get('agent_config', {})
     if not any([
@@ -14,13 +14,17 @@
 #    * limitations under the License.
 from cloudify import ctx
 from cloudify.decorators import operation
+from googleapiclient.errors import HttpError
 
 from .. import utils
+from cloudify_gcp.gcp import GCPError
 from cloudify_gcp.gcp import GoogleCloudPlatform
 from cloudify_gcp.gcp import check_response
 
 
 class InstanceGroup(GoogleCloudPlatform):
+    FIELDS = 'id,name,selfLink,zone,network,namedPorts'
+
     def __init__(self,
                  config,
                  logger,
@@ -44,13 +48,14 @@ class InstanceGroup(GoogleCloudPlatform):
         })
         return self.body
 
-    def instance_to_dict(self, instance_name):
-        url = 'zones/{0}/instances/{1}'.format(self.zone, instance_name)
+    def instances_to_dict(self, instance_names):
         return {
             'instances': [
                 {
-                    'instance': url
+                    'instance': 'zones/{0}/instances/{1}'.format(
+                        self.zone, instance_name)
                 }
+                for instance_name in instance_names
             ]
         }
 
@@ -60,17 +65,19 @@ class InstanceGroup(GoogleCloudPlatform):
         return self.self_url
 
     @check_response
-    def get(self):
+    def get(self, fields=None):
         return self.discovery.instanceGroups().get(
             project=self.project,
             zone=self.zone,
-            instanceGroup=self.name).execute()
+            instanceGroup=self.name,
+            fields=fields).execute()
 
-    @check_response
-    def list(self):
-        return self.discovery.instanceGroups().list(
+    def list(self, **kwargs):
+        return self.list_items(
+            self.discovery.instanceGroups(),
             project=self.project,
-            zone=self.zone).execute()
+            zone=self.zone,
+            **kwargs)
 
     @utils.async_operation(get=True)
     @check_response
@@ -88,21 +95,98 @@ class InstanceGroup(GoogleCloudPlatform):
             zone=self.zone,
             instanceGroup=self.name).execute()
 
-    @check_response
     def add_instance(self, instance_name):
+        """
+        Add the instance to the group, together with any others being added
+        to it at the same time.
+        """
+        return membership_changes.change(
+            self, 'add_instances', instance_name)
+
+    def remove_instance(self, instance_name):
+        """
+        Remove the instance from the group, together with any others being
+        removed from it at the same time.
+        """
+        return membership_changes.change(
+            self, 'remove_instances', instance_name)
+
+    @check_response
+    def add_instances(self, instance_names):
+        self.logger.info('Add {0} instances to instance group {1}'.format(
+            len(instance_names), self.name))
         return self.discovery.instanceGroups().addInstances(
             project=self.project,
             zone=self.zone,
             instanceGroup=self.name,
-            body=self.instance_to_dict(instance_name)).execute()
+            body=self.instances_to_dict(instance_names)).execute()
 
     @check_response
-    def remove_instance(self, instance_name):
+    def remove_instances(self, instance_names):
+        self.logger.info(
+            'Remove {0} instances from instance group {1}'.format(
+                len(instance_names), self.name))
         return self.discovery.instanceGroups().removeInstances(
             project=self.project,
             zone=self.zone,
             instanceGroup=self.name,
-            body=self.instance_to_dict(instance_name)).execute()
+            body=self.instances_to_dict(instance_names)).execute()
+
+
+class MembershipChanges(utils.Coalescer):
+    """
+    Combines membership changes made to an instance group by tasks running
+    concurrently in this process into one addInstances or removeInstances
+    call. GCP serialises changes to a group, so this saves each task waiting
+    for the others. A change is sent straight away unless another change of
+    the same kind to the group is being sent.
+
+    If a combined call fails, e.g. because one of the instances is already
+    a member, each instance is then sent separately. That way only the tasks
+    whose instance caused the failure get the error.
+    """
+
+    def change(self, group, method, instance_name):
+        """
+        Queue `instance_name` to be added to or removed from `group`.
+
+        :param method: 'add_instances' or 'remove_instances'
+        :return: REST response of the call which included the instance
+        """
+        item = [instance_name]
+        results = self.submit(
+            (group.project, group.zone, group.name, method), item,
+            lambda items: self.send(getattr(group, method), items))
+        response, error = results[id(item)]
+        if error is not None:
+            raise error
+        return response
+
+    @staticmethod
+    def send(call, items):
+        """
+        :param call: bound InstanceGroup method taking a list of instance
+        names
+        :return: dictionary mapping the id of each item to its
+        (response, error)
+        """
+        try:
+            response = call([name for item in items for name in item])
+            return {id(item): (response, None) for item in items}
+        except (GCPError, HttpError):
+            if len(items) == 1:
+                raise
+
+        results = {}
+        for item in items:
+            try:
+                results[id(item)] = (call(item), None)
+            except (GCPError, HttpError) as e:
+                results[id(item)] = (None, e)
+        return results
+
+
+membership_changes = MembershipChanges()
 
 
 @operation
@@ -133,6 +217,7 @@ def delete(**kwargs):
 
 
 @operation
+@utils.retry_on_failure('Retrying adding instance to instance group')
 @utils.throw_cloudify_exceptions
 def add_to_instance_group(instance_group_name, instance_name, **kwargs):
     gcp_config = utils.get_gcp_config()
@@ -143,6 +228,7 @@ def add_to_instance_group(instance_group_name, instance_name, **kwargs):
 
 
 @operation
+@utils.retry_on_failure('Retrying removing instance from instance group')
 @utils.throw_cloudify_exceptions
 def remove_from_instance_group(instance_group_name, instance_name, **kwargs):
     gcp_config = utils.get_gcp_config()
@@ -0,0 +1,164 @@
+# #######
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+from cloudify import ctx
+from cloudify.decorators import operation
+
+from .. import constants
+from .. import utils
+from ..gcp import check_response
+from ..gcp import GoogleCloudPlatform
+from .instance import (
+        Instance,
+        get_ssh_keys,
+        get_startup_script,
+        )
+
+
+class InstanceTemplate(GoogleCloudPlatform):
+    FIELDS = 'id,name,selfLink'
+
+    def __init__(self,
+                 config,
+                 logger,
+                 name,
+                 instance=None,
+                 ):
+        """
+        Create InstanceTemplate object
+
+        :param config: gcp auth file
+        :param logger: logger object
+        :param name: name of the instance template
+        :param instance: Instance describing the instances to be created
+        from the template
+        """
+        super(InstanceTemplate, self).__init__(
+            config,
+            logger,
+            utils.get_gcp_resource_name(name))
+        self.instance = instance
+
+    @check_response
+    def get(self, fields=None):
+        return self.discovery.instanceTemplates().get(
+            project=self.project,
+            instanceTemplate=self.name,
+            fields=fields).execute()
+
+    def list(self, **kwargs):
+        return self.list_items(
+            self.discovery.instanceTemplates(),
+            project=self.project,
+            **kwargs)
+
+    @utils.async_operation(get=True)
+    @check_response
+    def create(self):
+        return self.discovery.instanceTemplates().insert(
+            project=self.project,
+            body=self.to_dict()).execute()
+
+    @utils.async_operation()
+    @check_response
+    def delete(self):
+        return self.discovery.instanceTemplates().delete(
+            project=self.project,
+            instanceTemplate=self.name).execute()
+
+    def to_dict(self):
+        self.body.update({
+            'description': 'Cloudify generated instance template',
+            'name': self.name,
+            'properties': self.instance.to_properties(),
+        })
+        return self.body
+
+
+@operation
+@utils.throw_cloudify_exceptions
+def create(instance_type,
+           image_id,
+           name,
+           external_ip,
+           startup_script,
+           scopes,
+           tags,
+           can_ip_forward=False,
+           additional_settings=None,
+           **kwargs):
+    gcp_config = utils.get_gcp_config()
+    name = utils.get_final_resource_name(name)
+    network, subnetwork = utils.get_net_and_subnet(ctx)
+
+    instance = Instance(
+            gcp_config,
+            ctx.logger,
+            name=name,
+            image=image_id,
+            machine_type=instance_type,
+            external_ip=external_ip,
+            startup_script=get_startup_script(startup_script),
+            scopes=scopes,
+            tags=tags,
+            ssh_keys=get_ssh_keys() + get_keypair_ssh_keys(),
+            network=network,
+            subnetwork=subnetwork,
+            zone=utils.get_gcp_resource_name(gcp_config['zone']),
+            can_ip_forward=can_ip_forward,
+            additional_settings=additional_settings,
+            )
+    template = InstanceTemplate(
+            gcp_config,
+            ctx.logger,
+            name=name,
+            instance=instance,
+            )
+
+    utils.create(template)
+
+
+def get_keypair_ssh_keys():
+    """
+    Keys of the KeyPairs the template is connected to.
+
+    The keypair relationship only adds them to the runtime properties at
+    preconfigure, after the template has been created, so they are read from
+    the KeyPairs directly.
+    """
+    keys = []
+    for rel in utils.get_relationships(
+            ctx,
+            filter_relationships='cloudify.gcp.relationships.'
+                                 'instance_connected_to_keypair'):
+        props = rel.target.instance.runtime_properties
+        keys.append(utils.get_key_user_string(
+            props[constants.USER], props[constants.PUBLIC_KEY]))
+    return keys
+
+
+@operation
+@utils.retry_on_failure('Retrying deleting instance template')
+@utils.throw_cloudify_exceptions
+def delete(**kwargs):
+    gcp_config = utils.get_gcp_config()
+    name = ctx.instance.runtime_properties.get('name')
+    if name:
+        template = InstanceTemplate(
+                gcp_config,
+                ctx.logger,
+                name=name,
+                )
+        utils.delete_if_not_external(template)
@@ -0,0 +1,233 @@
+# #######
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+from os.path import basename
+
+from cloudify import ctx
+from cloudify.decorators import operation
+from cloudify.exceptions import NonRecoverableError
+
+from .. import utils
+from ..gcp import check_response
+from ..gcp import GoogleCloudPlatform
+
+
+class ManagedInstanceGroup(GoogleCloudPlatform):
+    """
+    A group of Instances created from an instance template, which GCP keeps
+    at its target size.
+
+    This class handles both zonal and regional groups. Regional groups spread
+    their instances across the zones of `region`, and are used when a region
+    is given.
+    """
+    FIELDS = ('id,name,selfLink,zone,region,instanceGroup,instanceTemplate,'
+              'baseInstanceName,targetSize')
+
+    def __init__(self,
+                 config,
+                 logger,
+                 name,
+                 additional_settings=None,
+                 instance_template=None,
+                 base_instance_name=None,
+                 target_size=None,
+                 named_ports=None,
+                 zone=None,
+                 region=None,
+                 ):
+        """
+        Create ManagedInstanceGroup object
+
+        :param config: gcp auth file
+        :param logger: logger object
+        :param name: name of the group
+        :param instance_template: URL of the template the instances are
+        created from
+        :param base_instance_name: prefix of the instances' names, default
+        the group's name
+        :param target_size: number of instances the group should have
+        :param named_ports: list of {name, port} dicts
+        :param zone: zone of a zonal group, default the configured zone
+        :param region: region of a regional group
+        """
+        super(ManagedInstanceGroup, self).__init__(
+            config,
+            logger,
+            utils.get_gcp_resource_name(name),
+            additional_settings)
+        self.instance_template = instance_template
+        self.base_instance_name = base_instance_name or self.name
+        self.target_size = target_size
+        self.named_ports = named_ports or []
+        if zone:
+            self.zone = zone
+        self.region = region
+
+    def _get_resource_type(self):
+        if self.region:
+            return self.discovery.regionInstanceGroupManagers()
+        return self.discovery.instanceGroupManagers()
+
+    def _common_kwargs(self):
+        args = {'project': self.project}
+        if self.region:
+            args['region'] = basename(self.region)
+        else:
+            args['zone'] = basename(self.zone)
+        return args
+
+    def to_dict(self):
+        self.body.update({
+            'description': 'Cloudify generated managed instance group',
+            'name': self.name,
+            'instanceTemplate': self.instance_template,
+            'baseInstanceName': self.base_instance_name,
+            'targetSize': self.target_size,
+            'namedPorts': self.named_ports,
+        })
+        return self.body
+
+    @check_response
+    def get(self, fields=None):
+        return self._get_resource_type().get(
+            instanceGroupManager=self.name,
+            fields=fields,
+            **self._common_kwargs()).execute()
+
+    def list(self, **kwargs):
+        kwargs.update(self._common_kwargs())
+        return self.list_items(self._get_resource_type(), **kwargs)
+
+    @utils.async_operation(get=True)
+    @check_response
+    def create(self):
+        return self._get_resource_type().insert(
+            body=self.to_dict(),
+            **self._common_kwargs()).execute()
+
+    @utils.async_operation()
+    @check_response
+    def delete(self):
+        return self._get_resource_type().delete(
+            instanceGroupManager=self.name,
+            **self._common_kwargs()).execute()
+
+    @utils.async_operation(get=True)
+    @check_response
+    def resize(self, size):
+        """
+        Add or remove instances so that the group has `size` of them.
+        """
+        self.logger.info(
+            'Resize managed instance group {0} to {1}'.format(
+                self.name, size))
+        return self._get_resource_type().resize(
+            instanceGroupManager=self.name,
+            size=size,
+            **self._common_kwargs()).execute()
+
+    @utils.async_operation(get=True)
+    @check_response
+    def create_instances(self, names):
+        """
+        Add instances with the given names to the group, increasing its
+        target size to match.
+        """
+        self.logger.info(
+            'Create {0} instances in managed instance group {1}'.format(
+                len(names), self.name))
+        return self._get_resource_type().createInstances(
+            instanceGroupManager=self.name,
+            body={'instances': [{'name': name} for name in names]},
+            **self._common_kwargs()).execute()
+
+
+def get_instance_template():
+    rels = utils.get_relationships(
+            ctx,
+            filter_relationships='cloudify.gcp.relationships.'
+                                 'instance_group_created_from_template',
+            )
+    if len(rels) != 1:
+        raise NonRecoverableError(
+                'A managed instance group must be connected to exactly one '
+                'InstanceTemplate')
+    return rels[0].target.instance.runtime_properties['selfLink']
+
+
+def get_managed_instance_group(gcp_config, **kwargs):
+    props = ctx.instance.runtime_properties
+    return ManagedInstanceGroup(
+            gcp_config,
+            ctx.logger,
+            name=props['name'],
+            zone=props.get('zone'),
+            region=props.get('region'),
+            **kwargs)
+
+
+@operation
+@utils.throw_cloudify_exceptions
+def create(name,
+           size,
+           base_instance_name,
+           named_ports,
+           zone,
+           region,
+           additional_settings,
+           **kwargs):
+    name = utils.get_final_resource_name(name)
+    gcp_config = utils.get_gcp_config()
+
+    group = ManagedInstanceGroup(
+            gcp_config,
+            ctx.logger,
+            name=name,
+            instance_template=get_instance_template(),
+            base_instance_name=base_instance_name,
+            target_size=size,
+            named_ports=named_ports,
+            zone=zone,
+            region=region,
+            additional_settings=additional_settings,
+            )
+
+    utils.create(group)
+
+
+@operation
+@utils.retry_on_failure('Retrying deleting managed instance group')
+@utils.throw_cloudify_exceptions
+def delete(**kwargs):
+    gcp_config = utils.get_gcp_config()
+    if ctx.instance.runtime_properties.get('name'):
+        group = get_managed_instance_group(gcp_config)
+        utils.delete_if_not_external(group)
+
+
+@operation
+@utils.throw_cloudify_exceptions
+def resize(size, **kwargs):
+    gcp_config = utils.get_gcp_config()
+    group = get_managed_instance_group(gcp_config)
+    group.resize(size)
+
+
+@operation
+@utils.throw_cloudify_exceptions
+def create_instances(names, **kwargs):
+    gcp_config = utils.get_gcp_config()
+    group = get_managed_instance_group(gcp_config)
+    group.create_instances(names)
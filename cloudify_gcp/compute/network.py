@@ -22,6 +22,8 @@ from ..gcp import GoogleCloudPlatform
 
 
 class Network(GoogleCloudPlatform):
+    FIELDS = 'id,name,selfLink,autoCreateSubnetworks,subnetworks'
+
     def __init__(self,
                  config,
                  logger,
@@ -77,28 +79,31 @@ class Network(GoogleCloudPlatform):
             network=self.name).execute()
 
     @check_response
-    def get(self):
+    def get(self, fields=None):
         """
         Get GCP network details.
 
+        :param fields: fields to fetch, e.g. self.FIELDS. All fields are
+        fetched by default
         :return: REST response with operation responsible for the network
         details retrieval
         """
         self.logger.info('Get network {0} details'.format(self.name))
         return self.discovery.networks().get(
             project=self.project,
-            network=self.name).execute()
+            network=self.name,
+            fields=fields).execute()
 
-    @check_response
-    def list(self):
+    def list(self, **kwargs):
         """
         List networks.
 
-        :return: REST response with list of networks in a project
+        :param kwargs: see GoogleCloudPlatform.list_items
+        :return: generator of the networks in the project
         """
         self.logger.info('List networks in project {0}'.format(self.project))
-        return self.discovery.networks().list(
-            project=self.project).execute()
+        return self.list_items(
+            self.discovery.networks(), project=self.project, **kwargs)
 
     def to_dict(self):
         self.body.update({
@@ -22,6 +22,9 @@ from ..gcp import GoogleCloudPlatform
 
 
 class Route(GoogleCloudPlatform):
+    FIELDS = ('id,name,selfLink,network,destRange,nextHopIp,nextHopInstance,'
+              'nextHopGateway')
+
     def __init__(
             self,
             config,
@@ -105,28 +108,31 @@ class Route(GoogleCloudPlatform):
             route=self.name).execute()
 
     @check_response
-    def get(self):
+    def get(self, fields=None):
         """
         Get GCP route details.
 
+        :param fields: fields to fetch, e.g. self.FIELDS. All fields are
+        fetched by default
         :return: REST response with operation responsible for the route
         details retrieval
         """
         self.logger.info('Get route {0} details'.format(self.name))
         return self.discovery.routes().get(
             project=self.project,
-            route=self.name).execute()
+            route=self.name,
+            fields=fields).execute()
 
-    @check_response
-    def list(self):
+    def list(self, **kwargs):
         """
         List routes.
 
-        :return: REST response with list of routes in a project
+        :param kwargs: see GoogleCloudPlatform.list_items
+        :return: generator of the routes in the project
         """
         self.logger.info('List routes in project {0}'.format(self.project))
-        return self.discovery.routes().list(
-            project=self.project).execute()
+        return self.list_items(
+            self.discovery.routes(), project=self.project, **kwargs)
 
     def to_dict(self):
         body = {
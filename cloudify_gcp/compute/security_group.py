@@ -14,6 +14,7 @@
 #    * limitations under the License.
 
 import re
+from collections import OrderedDict
 
 from cloudify import ctx
 from cloudify.decorators import operation
@@ -22,6 +23,8 @@ from cloudify.exceptions import NonRecoverableError
 from .. import utils
 from .. import constants
 from .firewall import FirewallRule
+from ..gcp import is_missing_resource_error
+from ..gcp import is_rate_limit_error
 
 
 @operation
@@ -31,22 +34,38 @@ def create(name, rules, **kwargs):
     gcp_config = utils.get_gcp_config()
     network = utils.get_network(ctx)
     name = 'ctx-sg-{}'.format(utils.get_final_resource_name(name))
+    firewalls = get_firewalls(gcp_config, network, name, rules)
 
-    firewalls = [
+    ctx.instance.runtime_properties['name'] = name
+    return handle_multiple_calls(firewalls, 'create', ctx.logger)
+
+
+def get_firewalls(gcp_config, network, name, rules):
+    """
+    Produce the FirewallRules making up the security group `name`
+    """
+    rules = optimize_rules(rules)
+    rule_names = []
+    for rule in rules:
+        rule_name = create_rule_name(name, rule)
+        if rule_name in rule_names:
+            # Parts of a split rule can be truncated to the same name
+            rule_name = utils.get_gcp_resource_name(
+                '{0}-{1}'.format(rule_name, len(rule_names)))
+        rule_names.append(rule_name)
+
+    return [
         FirewallRule(
                 gcp_config,
                 ctx.logger,
-                name=create_rule_name(name, rule),
+                name=firewall_name,
                 network=network,
                 allowed=rule['allowed'],
                 sources=rule['sources'],
                 tags=[name],
                 security_group=True,
                 )
-        for rule in rules]
-
-    ctx.instance.runtime_properties['name'] = name
-    return handle_multiple_calls(firewalls, 'create', ctx.logger)
+        for firewall_name, rule in zip(rule_names, rules)]
 
 
 def looks_like_a_cidr(addr):
@@ -82,6 +101,156 @@ def creation_validation(*args, **kwargs):
                 fail('invalid address: ' + source)
 
 
+def optimize_rules(rules):
+    """
+    Produce as few firewall rules as possible which allow the same traffic
+    as `rules`.
+
+    Rules allowing the same protocols and ports are merged, and their source
+    ranges collapsed into the fewest CIDR blocks covering them. Rules left
+    with the same sources then have their allowed protocols combined.
+    Finally rules with more sources than a firewall rule accepts are split.
+    """
+    by_allowed = OrderedDict()
+    for rule in rules:
+        key = allowed_key(rule['allowed'])
+        if key in by_allowed:
+            by_allowed[key]['sources'].extend(rule['sources'])
+        else:
+            by_allowed[key] = {
+                'allowed': rule['allowed'],
+                'sources': list(rule['sources']),
+                }
+
+    by_sources = OrderedDict()
+    for rule in by_allowed.values():
+        ranges, tags = split_sources(rule['sources'])
+        sources = tuple(collapse_cidrs(ranges) + sorted(set(tags)))
+        if sources in by_sources:
+            by_sources[sources]['allowed'] = merge_allowed(
+                by_sources[sources]['allowed'], rule['allowed'])
+        else:
+            by_sources[sources] = {
+                'allowed': rule['allowed'],
+                'sources': list(sources),
+                }
+
+    packed = []
+    max_ranges = constants.FIREWALL_MAX_SOURCE_RANGES
+    max_tags = constants.FIREWALL_MAX_SOURCE_TAGS
+    for rule in by_sources.values():
+        ranges, tags = split_sources(rule['sources'])
+        parts = max(
+            -(-len(ranges) // max_ranges),
+            -(-len(tags) // max_tags),
+            1)
+        for part in range(parts):
+            packed.append({
+                'allowed': rule['allowed'],
+                'sources': (
+                    ranges[part * max_ranges:(part + 1) * max_ranges] +
+                    tags[part * max_tags:(part + 1) * max_tags]),
+                })
+    return packed
+
+
+def allowed_key(allowed):
+    return tuple(sorted(
+        (protocol, tuple(sorted(str(port) for port in ports or [])))
+        for protocol, ports in allowed.items()))
+
+
+def merge_allowed(first, second):
+    merged = dict(first)
+    for protocol, ports in second.items():
+        if protocol not in merged:
+            merged[protocol] = ports
+        elif not merged[protocol] or not ports:
+            # No ports means any port
+            merged[protocol] = []
+        else:
+            merged[protocol] = list(merged[protocol]) + [
+                port for port in ports
+                if str(port) not in map(str, merged[protocol])]
+    return merged
+
+
+def split_sources(sources):
+    """
+    Separate source IP ranges from source tags, in the same way as
+    FirewallRule.to_dict
+    """
+    ranges = [source for source in sources if source[0].isdigit()]
+    tags = [source for source in sources if not source[0].isdigit()]
+    return ranges, tags
+
+
+def parse_cidr(addr):
+    """
+    :return: (first address as an integer, prefix length), or None if `addr`
+    isn't an IPv4 address or CIDR block
+    """
+    match = re.match(
+            r'^(\d{1,3})\.(\d{1,3})\.(\d{1,3})\.(\d{1,3})(?:/(\d{1,2}))?$',
+            addr,
+            )
+    if not match:
+        return None
+
+    octets = [int(octet) for octet in match.groups()[:4]]
+    prefix = int(match.group(5) or 32)
+    if prefix > 32 or any(octet > 255 for octet in octets):
+        return None
+
+    value = 0
+    for octet in octets:
+        value = value << 8 | octet
+    host_bits = (1 << (32 - prefix)) - 1
+    return value & ~host_bits, prefix
+
+
+def format_cidr(start, prefix):
+    return '{0}.{1}.{2}.{3}/{4}'.format(
+        start >> 24 & 255, start >> 16 & 255, start >> 8 & 255, start & 255,
+        prefix)
+
+
+def collapse_cidrs(ranges):
+    """
+    Produce the fewest CIDR blocks covering exactly the same addresses as
+    `ranges`. Anything which can't be parsed is kept as it is.
+    """
+    blocks = []
+    unparsed = []
+    for addr in ranges:
+        block = parse_cidr(addr)
+        if block is None:
+            unparsed.append(addr)
+        else:
+            blocks.append(block)
+
+    collapsed = []
+    for start, prefix in sorted(set(blocks)):
+        if collapsed:
+            last_start, last_prefix = collapsed[-1]
+            if start < last_start + (1 << (32 - last_prefix)):
+                # Contained within the previous block
+                continue
+        collapsed.append((start, prefix))
+
+        # Join the two halves of a larger block
+        while len(collapsed) > 1:
+            (first, first_prefix), (second, second_prefix) = collapsed[-2:]
+            size = 1 << (32 - first_prefix)
+            if (first_prefix != second_prefix or first_prefix == 0 or
+                    first % (size * 2) or second != first + size):
+                break
+            collapsed[-2:] = [(first, first_prefix - 1)]
+
+    return [format_cidr(*cidr) for cidr in collapsed] + sorted(
+        set(unparsed))
+
+
 def create_rule_name(name, rule):
     """
     Produce a gcp compatible rule name
@@ -96,16 +265,20 @@ def create_rule_name(name, rule):
 @utils.throw_cloudify_exceptions
 def configure(**kwargs):
     props = ctx.instance.runtime_properties
-    props['rules'] = []
+    gcp_config = utils.get_gcp_config()
     network = utils.get_network(ctx)
-    for name, op in props['_operations'].items():
-        firewall = FirewallRule(
-                utils.get_gcp_config(),
+    firewalls = [
+        FirewallRule(
+                gcp_config,
                 ctx.logger,
                 network=network,
                 name=name,
                 )
-        props['rules'].append(firewall.get())
+        for name in props['_operations']]
+
+    responses = firewalls[0].execute_batch(
+        {firewall.name: firewall.get_request() for firewall in firewalls})
+    props['rules'] = [responses[firewall.name] for firewall in firewalls]
     del props['_operations']
 
 
@@ -115,6 +288,13 @@ def handle_multiple_calls(objects, call, logger):
     successfully created.
 
     objects must be passed in a consistent order or bad things will happen.
+
+    Up to `concurrency` (from the gcp_config) calls are kept in progress at
+    once. Each round the new calls and the checks on operations already
+    started are sent in a single batch request, and rounds are repeated
+    within this task until every operation is done. If GCP rate limits any
+    of the requests they are sent again in a later round, with fewer calls
+    in progress.
     """
     props = ctx.instance.runtime_properties
     # Can be removed when
@@ -122,26 +302,55 @@ def handle_multiple_calls(objects, call, logger):
     # is finished:
     props.dirty = True
     operations = props.setdefault('_operations', {})
+    gcp_config = utils.get_gcp_config()
+    width = [gcp_config.get(
+        constants.CONCURRENCY, constants.MAX_CONCURRENT_CALLS)]
+    errors = []
 
-    for obj in objects:
-        if obj.name in operations:
-            if operations[obj.name]['status'] == 'DONE':
-                # This one is finished
-                continue
-            else:
+    def errback(name, error):
+        if is_rate_limit_error(error):
+            logger.debug('Request for {0} was rate limited'.format(name))
+            width[0] = max(width[0] // 2, 1)
+        else:
+            errors.append(error)
+
+    def step():
+        requests = {}
+        for obj in objects:
+            if obj.name in operations:
+                if operations[obj.name]['status'] == 'DONE':
+                    # This one is finished
+                    continue
                 op = utils.response_to_operation(
                         operations[obj.name],
-                        utils.get_gcp_config(),
+                        gcp_config,
                         logger,
                         )
-                operations[obj.name] = op.get()
-        else:
-            operations[obj.name] = getattr(obj, call)()
+                requests[obj.name] = op.get_request()
+
+        for obj in objects:
+            if len(requests) >= width[0]:
+                break
+            if obj.name not in operations:
+                requests[obj.name] = getattr(obj, call + '_request')()
+
+        if requests:
+            objects[0].execute_batch(
+                requests, operations.__setitem__, errback)
+            if errors:
+                raise errors[0]
 
-    not_done = [k for k, v in operations.items() if v['status'] != 'DONE']
-    if not_done:
+        return not not_done()
+
+    def not_done():
+        return [obj.name for obj in objects
+                if operations.get(obj.name, {}).get('status') != 'DONE']
+
+    try:
+        utils.Poller.from_config(gcp_config).poll(step)
+    except utils.PollingTimeout:
         return ctx.operation.retry(
-                'Rules {} not yet {}d'.format(str(not_done), call),
+                'Rules {} not yet {}d'.format(str(not_done()), call),
                 constants.RETRY_DEFAULT_DELAY)
 
 
@@ -162,3 +371,130 @@ def delete(**kwargs):
             for rule in props['rules']]
 
     return handle_multiple_calls(firewalls, 'delete', ctx.logger)
+
+
+@operation
+@utils.throw_cloudify_exceptions
+def update(rules, **kwargs):
+    """
+    Change the security group's firewall rules to match `rules`.
+
+    Rules which are unchanged are left alone, and changed rules are patched
+    in place, so that there is no gap in connectivity while the firewalls are
+    replaced. New rules are created before unneeded ones are deleted.
+    """
+    gcp_config = utils.get_gcp_config()
+    network = utils.get_network(ctx)
+    props = ctx.instance.runtime_properties
+
+    if '_update' not in props:
+        props['_update'] = plan_update(gcp_config, network, rules)
+    plan = props['_update']
+
+    def make_firewall(name, rule=None):
+        rule = rule or {}
+        return FirewallRule(
+                gcp_config,
+                ctx.logger,
+                name=name,
+                network=network,
+                allowed=rule.get('allowed'),
+                sources=rule.get('sources'),
+                tags=[props['name']],
+                security_group=True,
+                )
+
+    for call in 'create', 'patch', 'delete':
+        firewalls = [make_firewall(*item) for item in plan[call]]
+        if not firewalls:
+            continue
+        handle_multiple_calls(firewalls, call, ctx.logger)
+        operations = props['_operations']
+        if any(operations.get(firewall.name, {}).get('status') != 'DONE'
+               for firewall in firewalls):
+            # handle_multiple_calls has asked for a retry
+            return
+
+    firewalls = [make_firewall(name) for name in plan['keep']]
+    responses = firewalls[0].execute_batch(
+        {firewall.name: firewall.get_request() for firewall in firewalls})
+    props['rules'] = [responses[firewall.name] for firewall in firewalls]
+    del props['_update']
+    props.pop('_operations', None)
+
+
+def plan_update(gcp_config, network, rules):
+    """
+    Work out which of the security group's firewall rules need to be created,
+    patched, or deleted to match `rules`.
+
+    Firewall rules are matched by name, and then by content, so a rule which
+    was patched into a new one by an earlier update (and kept its old name)
+    is left alone. Firewall rules which are no longer needed are patched to
+    become new rules where possible, rather than one being deleted and
+    another created.
+    """
+    props = ctx.instance.runtime_properties
+    desired = get_firewalls(gcp_config, network, props['name'], rules)
+    existing = [
+            FirewallRule(
+                gcp_config,
+                ctx.logger,
+                name=rule['name'],
+                network=network,
+                )
+            for rule in props['rules']]
+
+    current = {}
+    errors = []
+
+    def errback(name, error):
+        # Rules which have gone missing are created again
+        if not is_missing_resource_error(error):
+            errors.append(error)
+
+    if existing:
+        current = existing[0].execute_batch(
+            {firewall.name: firewall.get_request() for firewall in existing},
+            errback=errback)
+        if errors:
+            raise errors[0]
+
+    desired_names = [firewall.name for firewall in desired]
+    unneeded = sorted(name for name in current if name not in desired_names)
+    new = []
+    reused = []
+    for firewall in desired:
+        if firewall.name in current:
+            continue
+        for name in unneeded:
+            if name not in reused and not firewall.diff(current[name]):
+                reused.append(name)
+                break
+        else:
+            new.append(firewall)
+    unneeded = [name for name in unneeded if name not in reused]
+
+    def item(name, firewall):
+        return [name, {
+            'allowed': firewall.allowed,
+            'sources': firewall.sources,
+            }]
+
+    plan = {
+        'create': [item(firewall.name, firewall)
+                   for firewall in new[len(unneeded):]],
+        'patch': [item(firewall.name, firewall)
+                  for firewall in desired
+                  if firewall.name in current and
+                  firewall.diff(current[firewall.name])] +
+                 [item(name, firewall)
+                  for name, firewall in zip(unneeded, new)],
+        'delete': [[name] for name in unneeded[len(new):]],
+        }
+    plan['keep'] = (
+        [firewall.name for firewall in desired if firewall.name in current] +
+        reused +
+        [name for name, _ in plan['patch'] if name in unneeded] +
+        [name for name, _ in plan['create']])
+    return plan
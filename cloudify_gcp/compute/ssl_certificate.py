@@ -23,6 +23,8 @@ from cloudify_gcp.gcp import check_response
 
 
 class SslCertificate(GoogleCloudPlatform):
+    FIELDS = 'id,name,selfLink'
+
     def __init__(self,
                  config,
                  logger,
@@ -51,15 +53,15 @@ class SslCertificate(GoogleCloudPlatform):
         return 'global/sslCertificates/{0}'.format(self.name)
 
     @check_response
-    def get(self):
+    def get(self, fields=None):
         return self.discovery.sslCertificates().get(
             project=self.project,
-            sslCertificate=self.name).execute()
+            sslCertificate=self.name,
+            fields=fields).execute()
 
-    @check_response
-    def list(self):
-        return self.discovery.sslCertificates().list(
-            project=self.project).execute()
+    def list(self, **kwargs):
+        return self.list_items(
+            self.discovery.sslCertificates(), project=self.project, **kwargs)
 
     @utils.async_operation(get=True)
     @check_response
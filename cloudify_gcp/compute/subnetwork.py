@@ -25,6 +25,8 @@ from ..gcp import GoogleCloudPlatform
 
 
 class SubNetwork(GoogleCloudPlatform):
+    FIELDS = 'id,name,selfLink,network,region,ipCidrRange,gatewayAddress'
+
     def __init__(self,
                  config,
                  logger,
@@ -85,10 +87,12 @@ class SubNetwork(GoogleCloudPlatform):
             ).execute()
 
     @check_response
-    def get(self):
+    def get(self, fields=None):
         """
         Get GCP subnetwork details.
 
+        :param fields: fields to fetch, e.g. self.FIELDS. All fields are
+        fetched by default
         :return: REST response with operation responsible for the subnetwork
         details retrieval
         """
@@ -96,19 +100,23 @@ class SubNetwork(GoogleCloudPlatform):
         return self.discovery.subnetworks().get(
             project=self.project,
             region=self.region,
-            subnetwork=self.name).execute()
+            subnetwork=self.name,
+            fields=fields).execute()
 
-    @check_response
-    def list(self):
+    def list(self, **kwargs):
         """
         List subnetworks.
 
-        :return: REST response with list of subnetworks in a project
+        :param kwargs: see GoogleCloudPlatform.list_items
+        :return: generator of the subnetworks in the region
         """
         self.logger.info(
                 'List subnetworks in project {0}'.format(self.project))
-        return self.discovery.subnetworks().list(
-            project=self.project).execute()
+        return self.list_items(
+            self.discovery.subnetworks(),
+            project=self.project,
+            region=basename(self.region),
+            **kwargs)
 
     def to_dict(self):
         body = {
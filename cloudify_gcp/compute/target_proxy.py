@@ -28,6 +28,7 @@ from ..gcp import (
 
 class TargetProxy(GoogleCloudPlatform):
     __metaclass__ = ABCMeta
+    FIELDS = 'id,name,selfLink,kind,urlMap,sslCertificates'
 
     def __init__(self,
                  config,
@@ -44,13 +45,14 @@ class TargetProxy(GoogleCloudPlatform):
         self.url_map = url_map
 
     @check_response
-    def get(self):
+    def get(self, fields=None):
         self_data = self.gcp_get_dict()
-        return self._gcp_target_proxies().get(**self_data).execute()
+        return self._gcp_target_proxies().get(
+            fields=fields, **self_data).execute()
 
-    @check_response
-    def list(self):
-        return self._gcp_target_proxies().list(project=self.project).execute()
+    def list(self, **kwargs):
+        return self.list_items(
+            self._gcp_target_proxies(), project=self.project, **kwargs)
 
     @utils.async_operation(get=True)
     @check_response
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+from mock import Mock, patch
+
+from cloudify_gcp.compute import autoscaler
+from ...tests import TestGCP
+
+
+@patch('cloudify_gcp.gcp.ServiceAccountCredentials.from_json_keyfile_dict')
+@patch('cloudify_gcp.gcp.build')
+class TestGCPAutoscaler(TestGCP):
+
+    def test_create(self, mock_build, *args):
+        rel = Mock()
+        rel.type = ('cloudify.gcp.relationships.'
+                    'autoscaler_connected_to_instance_group')
+        rel.target.instance.runtime_properties = {
+                'selfLink': 'group',
+                'zone': 'zones/a-zone',
+                }
+        self.ctxmock.instance.relationships = [rel]
+
+        autoscaler.create(
+                'autoscaler',
+                {'minNumReplicas': 1, 'maxNumReplicas': 10},
+                {},
+                )
+
+        mock_build().autoscalers().insert.assert_called_once_with(
+                body={
+                    'description': 'Cloudify generated autoscaler',
+                    'name': 'autoscaler',
+                    'target': 'group',
+                    'autoscalingPolicy': {
+                        'minNumReplicas': 1, 'maxNumReplicas': 10},
+                    },
+                project='not really a project',
+                zone='a-zone',
+                )
+
+    def test_delete(self, mock_build, *args):
+        self.ctxmock.instance.runtime_properties.update({
+                'name': 'autoscaler',
+                'region': 'regions/a-region',
+                })
+
+        autoscaler.delete()
+
+        mock_build().regionAutoscalers().delete.assert_called_once_with(
+                autoscaler='autoscaler',
+                project='not really a project',
+                region='a-region',
+                )
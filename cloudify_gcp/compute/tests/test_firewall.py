@@ -64,7 +64,8 @@ class TestGCPFirewall(TestGCP):
         mock_build.assert_called_once()
         mock_build().firewalls().get.assert_called_once_with(
                 firewall=True,
-                project='not really a project'
+                project='not really a project',
+                fields=None,
                 )
 
     def test_delete(self, mock_build, *args):
@@ -76,3 +77,52 @@ class TestGCPFirewall(TestGCP):
                 firewall='delete-name',
                 project='not really a project',
                 )
+
+    def test_update(self, mock_build, *args):
+        self.ctxmock.instance.runtime_properties['name'] = 'name'
+        mock_build().firewalls().get().execute.return_value = {
+                'name': 'name',
+                'network': 'https://www.googleapis.com/compute/v1/projects/'
+                           'not really a project/global/networks/'
+                           'not a real network',
+                'description': 'Cloudify generated FirewallRule',
+                'sourceRanges': ['10.0.0.0/24'],
+                'allowed': [
+                    {'IPProtocol': 'udp'},
+                    {'IPProtocol': 'tcp', 'ports': ['80', '443']},
+                    ],
+                }
+        mock_build().firewalls().patch().execute.return_value = {
+                'status': 'PENDING', 'name': 'op'}
+
+        firewall.update(
+                allowed={'tcp': [443, 80], 'udp': []},
+                sources=['10.0.0.0/24', '10.0.1.0/24'],
+                target_tags=None,
+                additional_settings={},
+                )
+
+        mock_build().firewalls().patch.assert_called_with(
+                body={'sourceRanges': ['10.0.0.0/24', '10.0.1.0/24']},
+                firewall='name',
+                project='not really a project',
+                )
+
+    def test_update_unchanged(self, mock_build, *args):
+        self.ctxmock.instance.runtime_properties['name'] = 'name'
+        mock_build().firewalls().get().execute.return_value = {
+                'name': 'name',
+                'network': 'not a real network',
+                'description': 'Cloudify generated FirewallRule',
+                'sourceTags': ['sauce'],
+                'allowed': [{'IPProtocol': 'tcp', 'ports': ['80']}],
+                }
+
+        firewall.update(
+                allowed={'tcp': ['80']},
+                sources=['sauce'],
+                target_tags=None,
+                additional_settings={},
+                )
+
+        mock_build().firewalls().patch.assert_not_called()
@@ -14,6 +14,11 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
+import io
+import os
+import tarfile
+import tempfile
+
 from mock import patch
 
 from cloudify_gcp.compute import image
@@ -26,8 +31,11 @@ from ...tests import TestGCP
 @patch('cloudify_gcp.gcp.build')
 class TestGCPimage(TestGCP):
 
+    @patch('cloudify_gcp.compute.image.file_md5', return_value='digest')
     @patch('cloudify_gcp.compute.image.Object')
-    def test_create(self, mock_Object, mock_build, *args):
+    def test_create(self, mock_Object, mock_md5, mock_build, *args):
+        mock_Object().content_md5.return_value = None
+        mock_Object.reset_mock()
         image.create(
                 'name',
                 'path',
@@ -47,8 +55,28 @@ class TestGCPimage(TestGCP):
                  },
                 self.ctxmock.logger.getChild(),
                 'name.tar.gz',
+                metadata={'cloudify-md5': 'digest'},
+                )
+        mock_Object().upload_to_bucket.assert_called_once()
+        mock_build().images().insert.assert_called_once()
+
+    @patch('cloudify_gcp.compute.image.file_md5', return_value='digest')
+    @patch('cloudify_gcp.compute.image.Object')
+    def test_create_unchanged(self, mock_Object, mock_md5, mock_build, *args):
+        mock_Object().content_md5.return_value = 'digest'
+        mock_Object().get.return_value = {'selfLink': 'link'}
+        mock_build().images().get().execute.return_value = {
+                'rawDisk': {'source': 'link', 'containerType': 'TAR'}}
+
+        image.create(
+                'name',
+                'path',
+                additional_settings={},
                 )
 
+        mock_Object().upload_to_bucket.assert_not_called()
+        mock_build().images().insert.assert_not_called()
+
     def test_delete(self, mock_build, *args):
         self.ctxmock.instance.runtime_properties['name'] = 'delete_name'
 
@@ -59,3 +87,28 @@ class TestGCPimage(TestGCP):
                 image='delete_name',
                 project='not really a project',
                 )
+
+    @patch('cloudify_gcp.compute.image.Object')
+    def test_create_raw_image(self, mock_Object, mock_build, *args):
+        fd, path = tempfile.mkstemp()
+        os.write(fd, b'disk')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        mock_Object().upload_stream.side_effect = (
+            lambda chunks, **kwargs: b''.join(chunks))
+
+        image.create(
+                'name',
+                'path',
+                additional_settings={},
+                raw_image=path,
+                )
+
+        archive = tarfile.open(
+                fileobj=io.BytesIO(
+                    mock_build().images().insert.call_args[1]['body']
+                    ['rawDisk']['source']),
+                mode='r:gz')
+        self.assertEqual(
+                b'disk', archive.extractfile('disk.raw').read())
+        self.ctxmock.download_resource.assert_not_called()
@@ -14,11 +14,14 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
+import threading
+import time
 from functools import partial
 
-from mock import patch
+from mock import Mock, patch
 
 from cloudify.exceptions import NonRecoverableError
+from cloudify.state import current_ctx
 
 from .. import instance
 from ...tests import TestGCP
@@ -102,7 +105,7 @@ class TestGCPInstance(TestGCP):
         mock_build().instances().get().execute.return_value = {
                 'you pass': 'the test',
                 }
-        mock_build().globalOperations().get().execute.return_value = {
+        mock_build().globalOperations().wait().execute.return_value = {
                 'status': 'DONE',
                 }
 
@@ -126,6 +129,35 @@ class TestGCPInstance(TestGCP):
                     },
                 self.ctxmock.instance.runtime_properties
                 )
+        mock_build().instances().get.assert_called_with(
+                instance='name',
+                project='not really a project',
+                zone='zone',
+                fields=instance.Instance.FIELDS)
+
+    def test_create_from_template(self, mock_build, *args):
+        rel = Mock()
+        rel.type = 'cloudify.gcp.relationships.instance_created_from_template'
+        rel.target.instance.runtime_properties = {'selfLink': 'template'}
+        self.ctxmock.instance.relationships = [rel]
+
+        instance.create(
+                'instance_type',
+                None,
+                'name',
+                zone='zone',
+                external_ip=False,
+                startup_script=None,
+                scopes='scopes',
+                tags=['tags'],
+                )
+
+        mock_build().instances().insert.assert_called_with(
+                body={'name': 'name'},
+                sourceInstanceTemplate='template',
+                project='not really a project',
+                zone='zone',
+                )
 
     def test_create_with_disk(self, mock_build, *args):
         self.ctxmock.instance.runtime_properties = {
@@ -212,9 +244,9 @@ class TestGCPInstance(TestGCP):
                 zone='a very fake zone',
                 )
 
-    @patch('cloudify_gcp.utils.get_item_from_gcp_response',
-           return_value={'networkInterfaces': [{'networkIP': 'a'}]})
-    def test_start(self, mock_getitem, mock_build, *args):
+    def test_start(self, mock_build, *args):
+        mock_build().instances().get().execute.return_value = {
+                'networkInterfaces': [{'networkIP': 'a'}]}
         self.ctxmock.node.properties['external_ip'] = False
         self.ctxmock.instance.runtime_properties['name'] = 'name'
         instance.start()
@@ -222,10 +254,16 @@ class TestGCPInstance(TestGCP):
         self.assertEqual(
                 self.ctxmock.instance.runtime_properties['ip'],
                 'a')
+        mock_build().instances().get.assert_called_with(
+                instance='name',
+                project='not really a project',
+                zone='a very fake zone',
+                fields=instance.Instance.FIELDS)
+        mock_build().instances().list.assert_not_called()
 
-    @patch('cloudify_gcp.utils.get_item_from_gcp_response', return_value={
-                'networkInterfaces': [{'accessConfigs': [{'natIP': '🕷'}]}]})
-    def test_start_with_external_ip(self, mock_getitem, mock_build, *args):
+    def test_start_with_external_ip(self, mock_build, *args):
+        mock_build().instances().get().execute.return_value = {
+                'networkInterfaces': [{'accessConfigs': [{'natIP': '🕷'}]}]}
         self.ctxmock.node.properties['external_ip'] = True
         self.ctxmock.instance.runtime_properties['name'] = 'name'
         instance.start()
@@ -234,6 +272,50 @@ class TestGCPInstance(TestGCP):
                 self.ctxmock.instance.runtime_properties['ip'],
                 '🕷')
 
+    def test_start_no_interface_yet(self, mock_build, *args):
+        mock_build().instances().get().execute.return_value = {
+                'networkInterfaces': [{}]}
+        self.ctxmock.node.properties['external_ip'] = True
+        self.ctxmock.instance.runtime_properties['name'] = 'name'
+        instance.start()
+
+        self.ctxmock.operation.retry.assert_called_once_with(
+                'The instance has not yet created network interface', 10)
+
+    def test_start_adds_name_tag(self, mock_build, *args):
+        mock_build().instances().get().execute.return_value = {
+                'networkInterfaces': [{'networkIP': 'a'}],
+                'tags': {'items': ['shared'], 'fingerprint': 'print'},
+                }
+        mock_build().zoneOperations().wait().execute.return_value = {
+                'status': 'DONE'}
+        mock_build().instances().setTags().execute.return_value = {
+                'name': 'op', 'zone': 'a very fake zone', 'status': 'RUNNING'}
+        self.ctxmock.node.properties['external_ip'] = False
+        props = self.ctxmock.instance.runtime_properties
+        props['name'] = 'name'
+        props['tags'] = {'items': ['shared']}
+
+        instance.start()
+
+        kwargs = mock_build().instances().setTags.call_args[1]
+        self.assertEqual('name', kwargs['instance'])
+        self.assertEqual(['name', 'shared'], sorted(kwargs['body']['items']))
+        self.assertEqual('print', kwargs['body']['fingerprint'])
+        self.assertEqual(['name', 'shared'], props['tags']['items'])
+
+    def test_start_has_name_tag(self, mock_build, *args):
+        mock_build().instances().get().execute.return_value = {
+                'networkInterfaces': [{'networkIP': 'a'}]}
+        self.ctxmock.node.properties['external_ip'] = False
+        props = self.ctxmock.instance.runtime_properties
+        props['name'] = 'name'
+        props['tags'] = {'items': ['name']}
+
+        instance.start()
+
+        mock_build().instances().setTags.assert_not_called()
+
     def test_delete(self, mock_build, *args):
         instance.delete('delete-name', 'a very fake zone')
 
@@ -256,7 +338,7 @@ class TestGCPInstance(TestGCP):
                 'another': 'yo',
                 '_operation': _op,
                 }
-        mock_build().globalOperations().get().execute.return_value = _op
+        mock_build().globalOperations().wait().execute.return_value = _op
 
         instance.delete('delete-name', 'zone')
 
@@ -492,3 +574,71 @@ class TestGCPInstance(TestGCP):
         keys = instance.get_ssh_keys()
 
         self.assertEqual([], keys)
+
+
+@patch('cloudify_gcp.gcp.ServiceAccountCredentials.from_json_keyfile_dict')
+@patch('cloudify_gcp.gcp.build')
+class TestBulkInsert(TestGCP):
+
+    def setUp(self):
+        super(TestBulkInsert, self).setUp()
+        self.bulk = instance.BulkInsert(window=0, max_count=2)
+
+    def make_instance(self, name):
+        return instance.Instance(
+                self.ctxmock.node.properties['gcp_config'],
+                self.ctxmock.logger,
+                name,
+                image='image',
+                machine_type='n1-standard-1',
+                zone='zone',
+                tags=['shared'],
+                bulk=True,
+                )
+
+    def test_single(self, mock_build, *args):
+        self.bulk.insert(self.make_instance('one'))
+
+        mock_build().instances().bulkInsert.assert_not_called()
+        body = mock_build().instances().insert.call_args[1]['body']
+        self.assertEqual('one', body['name'])
+        self.assertEqual(['one', 'shared'], sorted(body['tags']['items']))
+
+    @patch('cloudify_gcp.compute.instance.bulk_insert')
+    def test_own_disk(self, mock_bulk, mock_build, *args):
+        self.ctxmock.instance.runtime_properties[instance.constants.DISK] = {
+                'source': 'disk'}
+
+        self.make_instance('one').create()
+
+        mock_bulk.insert.assert_not_called()
+        body = mock_build().instances().insert.call_args[1]['body']
+        self.assertEqual([{'source': 'disk'}], body['disks'])
+
+    def test_grouped(self, mock_build, *args):
+        self.bulk.window = 10
+        responses = {}
+
+        def leader(ctx):
+            current_ctx.set(ctx)
+            responses['one'] = self.bulk.insert(self.make_instance('one'))
+
+        thread = threading.Thread(target=leader, args=(self.ctxmock,))
+        thread.start()
+        while not self.bulk._pending:
+            time.sleep(0.01)
+        responses['two'] = self.bulk.insert(self.make_instance('two'))
+        thread.join()
+
+        bulk_insert = mock_build().instances().bulkInsert
+        bulk_insert.assert_called_once()
+        kwargs = bulk_insert.call_args[1]
+        self.assertEqual('zone', kwargs['zone'])
+        self.assertEqual(2, kwargs['body']['count'])
+        self.assertEqual(
+                {'one': {}, 'two': {}},
+                kwargs['body']['perInstanceProperties'])
+        self.assertEqual(
+                'n1-standard-1',
+                kwargs['body']['instanceProperties']['machineType'])
+        self.assertIs(responses['one'], responses['two'])
@@ -13,9 +13,13 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
-from mock import patch
+import time
+import unittest
+
+from mock import Mock, call, patch
 
 from .. import instance_group
+from ...gcp import GCPError
 from ...tests import TestGCP
 
 
@@ -77,3 +81,72 @@ class TestInstanceGroup(TestGCP):
                 project='not really a project',
                 zone='a very fake zone'
                 )
+
+    def test_add_many_to_instance_group(self, mock_build, *args):
+        group = instance_group.InstanceGroup(
+                self.ctxmock.node.properties['gcp_config'],
+                self.ctxmock.logger,
+                'group name')
+
+        group.add_instances(['one', 'two'])
+
+        mock_build().instanceGroups().addInstances.assert_called_once_with(
+                body={
+                    'instances': [
+                        {'instance': 'zones/a very fake zone/instances/one'},
+                        {'instance': 'zones/a very fake zone/instances/two'},
+                        ]},
+                instanceGroup='group name',
+                project='not really a project',
+                zone='a very fake zone'
+                )
+
+
+class TestMembershipChanges(unittest.TestCase):
+
+    def test_send(self):
+        add = Mock(return_value='op')
+        items = [['one'], ['two']]
+
+        results = instance_group.MembershipChanges.send(add, items)
+
+        add.assert_called_once_with(['one', 'two'])
+        self.assertEqual(
+                {id(item): ('op', None) for item in items},
+                results)
+
+    def test_send_failed(self):
+        error = GCPError('already a member')
+        add = Mock(side_effect=[GCPError('combined'), 'op', error])
+        items = [['one'], ['two']]
+
+        results = instance_group.MembershipChanges.send(add, items)
+
+        add.assert_has_calls([
+                call(['one', 'two']),
+                call(['one']),
+                call(['two']),
+                ])
+        self.assertEqual(
+                {id(items[0]): ('op', None), id(items[1]): (None, error)},
+                results)
+
+    def test_change_alone(self):
+        group = Mock()
+        group.add_instances.return_value = 'op'
+        changes = instance_group.MembershipChanges(window=10)
+        started = time.time()
+
+        self.assertEqual('op', changes.change(group, 'add_instances', 'one'))
+
+        # Nothing else was being sent, so it wasn't held back
+        self.assertLess(time.time() - started, 5)
+        group.add_instances.assert_called_once_with(['one'])
+
+    def test_change_raises(self):
+        group = Mock()
+        group.add_instances.side_effect = GCPError('already a member')
+        changes = instance_group.MembershipChanges()
+
+        with self.assertRaises(GCPError):
+            changes.change(group, 'add_instances', 'one')
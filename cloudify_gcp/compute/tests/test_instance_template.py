@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+from mock import Mock, patch
+
+from cloudify_gcp.compute import instance_template
+from ...tests import TestGCP
+
+
+@patch('cloudify_gcp.gcp.ServiceAccountCredentials.from_json_keyfile_dict')
+@patch('cloudify_gcp.gcp.build')
+class TestGCPInstanceTemplate(TestGCP):
+
+    def test_create(self, mock_build, *args):
+        instance_template.create(
+                instance_type='n1-standard-1',
+                image_id='image_id',
+                name='template-name',
+                external_ip=False,
+                startup_script=None,
+                scopes='scopes',
+                tags=['tags'],
+                )
+
+        mock_build().instanceTemplates().insert.assert_called_once_with(
+                body={
+                    'description': 'Cloudify generated instance template',
+                    'name': 'template-name',
+                    'properties': {
+                        'machineType': 'n1-standard-1',
+                        'tags': {'items': ['tags']},
+                        'description': 'Cloudify generated instance',
+                        'disks': [{
+                            'initializeParams': {'sourceImage': 'image_id'},
+                            'boot': True, 'autoDelete': True}],
+                        'serviceAccounts': [{
+                            'scopes': 'scopes',
+                            'email': 'default'}],
+                        'metadata': {
+                            'items': [
+                                {'value': 'not really a project',
+                                 'key': 'bucket'},
+                                {'value': '', 'key': 'sshKeys'}]},
+                        'networkInterfaces': [{
+                            'network': 'not a real network'}],
+                        'canIpForward': False,
+                        },
+                    },
+                project='not really a project',
+                )
+
+    def test_create_keypair(self, mock_build, *args):
+        rel = Mock()
+        rel.type = 'cloudify.gcp.relationships.instance_connected_to_keypair'
+        rel.target.instance.runtime_properties = {
+                'user': 'fred',
+                'gcp_public_key': 'ssh-rsa key fred@host',
+                }
+        self.ctxmock.instance.relationships = [rel]
+
+        instance_template.create(
+                instance_type='n1-standard-1',
+                image_id='image_id',
+                name='template-name',
+                external_ip=False,
+                startup_script=None,
+                scopes='scopes',
+                tags=['tags'],
+                )
+
+        body = mock_build().instanceTemplates().insert.call_args[1]['body']
+        self.assertIn(
+                {'key': 'sshKeys', 'value': 'fred:ssh-rsa key fred'},
+                body['properties']['metadata']['items'])
+
+    def test_delete(self, mock_build, *args):
+        self.ctxmock.instance.runtime_properties = {
+                'name': 'template-name',
+                }
+
+        instance_template.delete()
+
+        mock_build().instanceTemplates().delete.assert_called_once_with(
+                instanceTemplate='template-name',
+                project='not really a project',
+                )
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+from mock import Mock, patch
+
+from cloudify.exceptions import NonRecoverableError
+
+from cloudify_gcp.compute import managed_instance_group
+from ...tests import TestGCP
+
+
+@patch('cloudify_gcp.gcp.ServiceAccountCredentials.from_json_keyfile_dict')
+@patch('cloudify_gcp.gcp.build')
+class TestGCPManagedInstanceGroup(TestGCP):
+
+    def setUp(self):
+        super(TestGCPManagedInstanceGroup, self).setUp()
+        rel = Mock()
+        rel.type = ('cloudify.gcp.relationships.'
+                    'instance_group_created_from_template')
+        rel.target.instance.runtime_properties = {'selfLink': 'template'}
+        self.ctxmock.instance.relationships = [rel]
+
+    def create(self, **kwargs):
+        args = {
+            'name': 'group',
+            'size': 3,
+            'base_instance_name': '',
+            'named_ports': [],
+            'zone': '',
+            'region': '',
+            'additional_settings': {},
+            }
+        args.update(kwargs)
+        managed_instance_group.create(**args)
+
+    def test_create(self, mock_build, *args):
+        self.create()
+
+        mock_build().instanceGroupManagers().insert.assert_called_once_with(
+                body={
+                    'description': 'Cloudify generated managed instance group',
+                    'name': 'group',
+                    'instanceTemplate': 'template',
+                    'baseInstanceName': 'group',
+                    'targetSize': 3,
+                    'namedPorts': [],
+                    },
+                project='not really a project',
+                zone='a very fake zone',
+                )
+
+    def test_create_regional(self, mock_build, *args):
+        self.create(region='europe-west1')
+
+        mock_build().instanceGroupManagers().insert.assert_not_called()
+        insert = mock_build().regionInstanceGroupManagers().insert
+        self.assertEqual('europe-west1', insert.call_args[1]['region'])
+
+    def test_create_no_template(self, mock_build, *args):
+        self.ctxmock.instance.relationships = []
+
+        with self.assertRaises(NonRecoverableError):
+            self.create()
+
+    def test_resize(self, mock_build, *args):
+        self.ctxmock.instance.runtime_properties.update({
+                'name': 'group',
+                'zone': 'zones/a-zone',
+                })
+
+        managed_instance_group.resize(100)
+
+        mock_build().instanceGroupManagers().resize.assert_called_once_with(
+                instanceGroupManager='group',
+                size=100,
+                project='not really a project',
+                zone='a-zone',
+                )
+
+    def test_delete(self, mock_build, *args):
+        self.ctxmock.instance.runtime_properties.update({
+                'name': 'group',
+                'region': 'regions/a-region',
+                })
+
+        managed_instance_group.delete()
+
+        delete = mock_build().regionInstanceGroupManagers().delete
+        delete.assert_called_once_with(
+                instanceGroupManager='group',
+                project='not really a project',
+                region='a-region',
+                )
@@ -14,10 +14,12 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
-from mock import patch
+import unittest
+
+from mock import Mock, patch
 
 from cloudify_gcp.compute import security_group
-from ...tests import TestGCP
+from ...tests import TestGCP, fake_batch
 
 
 @patch('cloudify_gcp.utils.assure_resource_id_correct', return_value=True)
@@ -30,6 +32,10 @@ class TestGCPSecurityGroup(TestGCP):
         self.ctxmock.instance.relationships = []
 
     def test_create(self, mock_build, *args):
+        discovery = mock_build.return_value
+        discovery.new_batch_http_request.side_effect = fake_batch
+        discovery.firewalls().insert().execute.return_value = done = {
+                'status': 'DONE', 'name': 'op'}
         self.ctxmock.node.properties['rules'] = rules = [
                     {
                         'allowed': {'NOTHING!': ''},
@@ -46,7 +52,7 @@ class TestGCPSecurityGroup(TestGCP):
                 rules,
                 )
 
-        self.assertEqual(2, mock_build.call_count)
+        mock_build.assert_called_once()
         for body in [
                 {
                     'network': 'not a real network',
@@ -75,7 +81,165 @@ class TestGCPSecurityGroup(TestGCP):
                     project='not really a project'
                     )
 
+        self.assertEqual(1, mock_build().new_batch_http_request.call_count)
+        self.assertEqual(
+                {
+                    'ctx-sg-name-from-bobjane-to-nothing': done,
+                    'ctx-sg-name-from-jane-to-tcp4041': done,
+                },
+                self.ctxmock.instance.runtime_properties['_operations'])
+
+    @patch('cloudify_gcp.utils.time.sleep')
+    def test_create_waits(self, mock_sleep, mock_build, *args):
+        mock_build().new_batch_http_request.side_effect = fake_batch
+        mock_build().firewalls().insert().execute.return_value = {
+                'status': 'RUNNING', 'name': 'op'}
+        mock_build().globalOperations().get().execute.return_value = {
+                'status': 'DONE', 'name': 'op'}
+        self.ctxmock.node.properties['gcp_config']['concurrency'] = 1
+        rules = [
+                {'allowed': {'tcp': ['80']}, 'sources': ['bob']},
+                {'allowed': {'tcp': ['443']}, 'sources': ['jane']},
+                ]
+
+        security_group.create('name', rules)
+
+        # One round for each insert, and one for each check on it
+        self.assertEqual(4, mock_build().new_batch_http_request.call_count)
+        self.assertEqual(
+                ['DONE', 'DONE'],
+                [op['status'] for op in self.ctxmock.instance
+                    .runtime_properties['_operations'].values()])
+        self.ctxmock.operation.retry.assert_not_called()
+
+    def test_configure(self, mock_build, *args):
+        mock_build().new_batch_http_request.side_effect = fake_batch
+        mock_build().firewalls().get().execute.return_value = {'rule': 1}
+        props = self.ctxmock.instance.runtime_properties
+        props['_operations'] = {
+                'rule-a': {'status': 'DONE'},
+                'rule-b': {'status': 'DONE'},
+                }
+
+        security_group.configure()
+
+        self.assertEqual([{'rule': 1}, {'rule': 1}], props['rules'])
+        self.assertNotIn('_operations', props)
+        for name in 'rule-a', 'rule-b':
+            mock_build().firewalls().get.assert_any_call(
+                    firewall=name,
+                    project='not really a project',
+                    fields=None,
+                    )
+
+    def test_update(self, mock_build, *args):
+        mock_build().new_batch_http_request.side_effect = fake_batch
+        props = self.ctxmock.instance.runtime_properties
+        props['name'] = 'ctx-sg-name'
+        props['rules'] = [
+                {'name': 'ctx-sg-name-from-bob-to-tcp80'},
+                {'name': 'ctx-sg-name-from-jane-to-tcp443'},
+                ]
+        current = {
+                'network': 'not a real network',
+                'description': 'Cloudify generated SG part',
+                'targetTags': ['ctx-sg-name'],
+                }
+
+        def get(firewall, **kwargs):
+            response = dict(current, name=firewall)
+            response['sourceTags'] = [firewall.split('-')[4]]
+            response['allowed'] = [{
+                'IPProtocol': 'tcp',
+                'ports': [firewall.split('-')[-1][3:]],
+                }]
+            request = Mock()
+            request.execute.return_value = response
+            return request
+        mock_build().firewalls().get.side_effect = get
+        mock_build().firewalls().patch().execute.return_value = {
+                'status': 'DONE', 'name': 'op'}
+
+        security_group.update([
+                {'allowed': {'tcp': ['80']}, 'sources': ['bob']},
+                {'allowed': {'tcp': ['22']}, 'sources': ['jane']},
+                ])
+
+        # The rule which is no longer needed is changed into the new one
+        mock_build().firewalls().patch.assert_called_with(
+                body={
+                    'network': 'not a real network',
+                    'description': 'Cloudify generated SG part',
+                    'targetTags': ['ctx-sg-name'],
+                    'sourceTags': ['jane'],
+                    'sourceRanges': [],
+                    'allowed': [{'IPProtocol': 'tcp', 'ports': ['22']}],
+                    },
+                firewall='ctx-sg-name-from-jane-to-tcp443',
+                project='not really a project',
+                )
+        mock_build().firewalls().insert.assert_not_called()
+        mock_build().firewalls().delete.assert_not_called()
+        self.assertEqual(
+                ['ctx-sg-name-from-bob-to-tcp80',
+                 'ctx-sg-name-from-jane-to-tcp443'],
+                [rule['name'] for rule in props['rules']])
+        self.assertNotIn('_update', props)
+        self.assertNotIn('_operations', props)
+
+    def test_update_again(self, mock_build, *args):
+        mock_build().new_batch_http_request.side_effect = fake_batch
+        props = self.ctxmock.instance.runtime_properties
+        props['name'] = 'ctx-sg-name'
+        props['rules'] = [
+                {'name': 'ctx-sg-name-from-bob-to-tcp80'},
+                {'name': 'ctx-sg-name-from-jane-to-tcp443'},
+                ]
+        # The state test_update leaves the rules in
+        current = {
+                'ctx-sg-name-from-bob-to-tcp80': (['bob'], '80'),
+                'ctx-sg-name-from-jane-to-tcp443': (['jane'], '22'),
+                }
+
+        def get(firewall, **kwargs):
+            sources, port = current[firewall]
+            request = Mock()
+            request.execute.return_value = {
+                'name': firewall,
+                'network': 'not a real network',
+                'description': 'Cloudify generated SG part',
+                'targetTags': ['ctx-sg-name'],
+                'sourceTags': sources,
+                'allowed': [{'IPProtocol': 'tcp', 'ports': [port]}],
+                }
+            return request
+        mock_build().firewalls().get.side_effect = get
+        rules = [
+                {'allowed': {'tcp': ['80']}, 'sources': ['bob']},
+                {'allowed': {'tcp': ['22']}, 'sources': ['jane']},
+                ]
+
+        plan = security_group.plan_update(
+                self.ctxmock.node.properties['gcp_config'],
+                'not a real network',
+                rules)
+
+        self.assertEqual([], plan['create'])
+        self.assertEqual([], plan['patch'])
+        self.assertEqual([], plan['delete'])
+        self.assertEqual(sorted(current), sorted(plan['keep']))
+
+        security_group.update(rules)
+
+        mock_build().firewalls().patch.assert_not_called()
+        mock_build().firewalls().insert.assert_not_called()
+        mock_build().firewalls().delete.assert_not_called()
+
     def test_delete(self, mock_build, *args):
+        discovery = mock_build.return_value
+        discovery.new_batch_http_request.side_effect = fake_batch
+        discovery.firewalls().delete().execute.return_value = {
+                'status': 'DONE', 'name': 'op'}
         props = self.ctxmock.instance.runtime_properties
         props['gcp_name'] = 'delete_name'
         props['rules'] = [
@@ -85,8 +249,60 @@ class TestGCPSecurityGroup(TestGCP):
 
         security_group.delete()
 
-        self.assertEqual(2, mock_build.call_count)
+        mock_build.assert_called_once()
         mock_build().firewalls().delete.assert_called_with(
                 firewall='youdonottalkaboutfightclub',
                 project='not really a project',
                 )
+
+
+class TestOptimizeRules(unittest.TestCase):
+
+    def test_collapse_cidrs(self):
+        self.assertEqual(
+                ['10.0.0.0/23', '192.168.1.1/32'],
+                security_group.collapse_cidrs([
+                    '10.0.1.0/24',
+                    '10.0.0.128/25',
+                    '10.0.0.0/25',
+                    '10.0.0.7',
+                    '192.168.1.1',
+                    ]))
+
+    def test_collapse_cidrs_unaligned(self):
+        # Adjacent, but together they aren't a single CIDR block
+        self.assertEqual(
+                ['10.0.1.0/24', '10.0.2.0/24'],
+                security_group.collapse_cidrs(['10.0.2.0/24', '10.0.1.0/24']))
+
+    def test_merge_same_allowed(self):
+        self.assertEqual(
+                [{'allowed': {'tcp': ['80']},
+                  'sources': ['10.0.0.0/23', 'bob']}],
+                security_group.optimize_rules([
+                    {'allowed': {'tcp': ['80']},
+                     'sources': ['10.0.0.0/24', 'bob']},
+                    {'allowed': {'tcp': [80]},
+                     'sources': ['10.0.1.0/24']},
+                    ]))
+
+    def test_merge_same_sources(self):
+        self.assertEqual(
+                [{'allowed': {'tcp': ['80', '443'], 'udp': []},
+                  'sources': ['bob']}],
+                security_group.optimize_rules([
+                    {'allowed': {'tcp': ['80']}, 'sources': ['bob']},
+                    {'allowed': {'tcp': ['443'], 'udp': []},
+                     'sources': ['bob']},
+                    ]))
+
+    @patch('cloudify_gcp.constants.FIREWALL_MAX_SOURCE_TAGS', 2)
+    def test_split_too_many_sources(self):
+        self.assertEqual(
+                [
+                    {'allowed': {'tcp': []}, 'sources': ['a', 'b']},
+                    {'allowed': {'tcp': []}, 'sources': ['c']},
+                ],
+                security_group.optimize_rules([
+                    {'allowed': {'tcp': []}, 'sources': ['c', 'b', 'a']},
+                    ]))
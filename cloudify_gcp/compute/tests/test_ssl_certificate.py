@@ -35,7 +35,7 @@ class TestSslCertificate(TestGCP):
     def test_create(self, mock_response, mock_get_pem, mock_build, *args):
 
         operation = MagicMock()
-        operation.get.side_effect = [
+        operation.wait.side_effect = [
                 {'status': 'PENDING'},
                 {'status': 'DONE'},
                 ]
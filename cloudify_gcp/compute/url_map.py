@@ -25,6 +25,8 @@ from cloudify_gcp.gcp import (
 
 
 class UrlMap(GoogleCloudPlatform):
+    FIELDS = 'id,name,selfLink,defaultService'
+
     def __init__(self,
                  config,
                  logger,
@@ -49,14 +51,15 @@ class UrlMap(GoogleCloudPlatform):
         return 'global/urlMaps/{0}'.format(self.name)
 
     @check_response
-    def get(self):
+    def get(self, fields=None):
         return self.discovery.urlMaps().get(
             project=self.project,
-            urlMap=self.name).execute()
+            urlMap=self.name,
+            fields=fields).execute()
 
-    @check_response
-    def list(self):
-        return self.discovery.urlMaps().list(project=self.project).execute()
+    def list(self, **kwargs):
+        return self.list_items(
+            self.discovery.urlMaps(), project=self.project, **kwargs)
 
     @utils.async_operation(get=True)
     @check_response
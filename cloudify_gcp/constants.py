@@ -23,8 +23,31 @@ STORAGE_SCOPE_FULL = 'https://www.googleapis.com/auth/devstorage.full_control'
 
 COMPUTE_DISCOVERY = 'compute'
 STORAGE_DISCOVERY = 'storage'
+DNS_DISCOVERY = 'dns'
 
 CHUNKSIZE = 2 * 1024 * 1024
+# Upload chunks are resized towards taking UPLOAD_CHUNK_SECONDS each. Their
+# size must be a multiple of MIN_CHUNKSIZE
+UPLOAD_CHUNK_SECONDS = 10
+MIN_CHUNKSIZE = 256 * 1024
+MAX_CHUNKSIZE = 64 * 1024 * 1024
+# Files larger than UPLOAD_COMPOSITE_THRESHOLD are uploaded as parts of
+# UPLOAD_PART_SIZE, UPLOAD_WORKERS at a time, which are then composed
+UPLOAD_PART_SIZE = 64 * 1024 * 1024
+UPLOAD_WORKERS = 8
+UPLOAD_COMPOSITE_THRESHOLD = 2 * UPLOAD_PART_SIZE
+# The most objects a single compose request accepts
+MAX_COMPOSE_SOURCES = 32
+
+DISCOVERY_CACHE_SIZE = 32
+DISCOVERY_CACHE_TTL = 30 * 60
+
+# The most requests Google APIs accept in a single batch
+MAX_BATCH_SIZE = 1000
+# The largest page size accepted by list requests
+MAX_RESULTS = 500
+# Default number of calls for a single node to have in progress at once
+MAX_CONCURRENT_CALLS = 10
 
 API_V1 = 'v1'
 API_BETA = 'beta'
@@ -39,6 +62,9 @@ SELF_URL = 'selfLink'
 ID = 'id'
 TARGET_TAGS = 'targetTags'
 SOURCE_TAGS = 'sourceTags'
+# Most sources of each kind a single firewall rule accepts
+FIREWALL_MAX_SOURCE_RANGES = 256
+FIREWALL_MAX_SOURCE_TAGS = 30
 PUBLIC_KEY = 'gcp_public_key'
 PRIVATE_KEY = 'gcp_private_key'
 USER = 'user'
@@ -57,6 +83,10 @@ AUTH = 'auth'
 PROJECT = 'project'
 ZONE = 'zone'
 NETWORK = 'network'
+DISCOVERY_REFRESH = 'discovery_refresh'
+POLLING = 'polling'
+CONCURRENCY = 'concurrency'
+UPLOAD = 'upload'
 
 GCP_OP_DONE = 'DONE'
 
@@ -64,6 +94,33 @@ MANAGER_PLUGIN_FILES = os.path.join('/etc', 'cloudify', 'gcp_plugin')
 GCP_DEFAULT_CONFIG_PATH = os.path.join(MANAGER_PLUGIN_FILES, 'gcp_config')
 
 RETRY_DEFAULT_DELAY = 30
+RETRY_MIN_DELAY = 2
+
+OPERATION_WATCHER_MAX_AGE = 5
+# Seconds before a DNS zone's record snapshot is checked against its serial
+DNS_SNAPSHOT_MAX_AGE = 60
+
+OPERATION_STATS_PATH = os.path.join('~', '.cloudify', 'gcp_operation_stats')
+
+TOKEN_CACHE_PATH = os.path.join('~', '.cloudify', 'gcp_token_cache')
+# Seconds before an access token expires that it is replaced
+TOKEN_REFRESH_MARGIN = 5 * 60
+
+POLL_INITIAL_DELAY = 1
+POLL_MAX_DELAY = 15
+POLL_MAX_WAIT = 10 * 60
+POLL_MAX_REQUESTS = 100
+
+# Seconds the first Instance of a shape waits for others to join its
+# bulkInsert request, and the most instances one request may create
+BULK_INSERT_WINDOW = 2
+BULK_INSERT_MAX_COUNT = 1000
+
+# Most seconds a request which can be combined with others waits for the
+# same kind of request being sent to finish, while others join it
+COALESCE_WINDOW = 2
+# The most record sets one DNS change may add, and may delete
+DNS_CHANGE_MAX_RRSETS = 1000
 
 REGION_ZONES = {
         'us-west1': 'ab',
@@ -13,13 +13,18 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
+import threading
+import time
+
 from cloudify import ctx
 from cloudify.decorators import operation
+from googleapiclient.errors import HttpError
 
 from .. import constants
 from .. import utils
 from ..gcp import (
     check_response,
+    GCPError,
     GoogleCloudPlatform,
     )
 
@@ -45,7 +50,7 @@ class DNSZone(GoogleCloudPlatform):
             config,
             logger,
             utils.get_gcp_resource_name(name),
-            discovery='dns',
+            discovery=constants.DNS_DISCOVERY,
             scope='https://www.googleapis.com/auth/ndev.clouddns.readwrite',
             additional_settings=additional_settings,
             )
@@ -90,33 +95,254 @@ class DNSZone(GoogleCloudPlatform):
         return self.body
 
     def list_records(self, name=None, type=None):
-        rrsets = []
-
-        resources = self.discovery.resourceRecordSets()
+        """
+        Find record sets in the zone, from the snapshot shared by every task
+        in this process.
 
-        request = resources.list(
-                project=self.project,
-                managedZone=self.name,
-                type=type,
-                name='.'.join([name, self.dns_name]),
-                )
+        :param name: subdomain of the records, default any
+        :param type: type of the records, default any
+        """
+        if name and type:
+            record = self.get_record(name, type)
+            return [record] if record else []
 
-        while request is not None:
-            response = request.execute()
+        full_name = '.'.join([name, self.dns_name]) if name else None
+        return [
+            rrset
+            for (rrset_name, rrset_type), rrset
+            in zone_snapshots.get(self).items()
+            if (not name or rrset_name == full_name) and
+            (not type or rrset_type == type)]
 
-            rrsets.extend(response['rrsets'])
+    def get_record(self, name, type):
+        """
+        :return: the record set with the given subdomain and type, or None
+        """
+        return zone_snapshots.get(self).get(
+            ('.'.join([name, self.dns_name]), type))
 
-            request = resources.list_next(
-                    previous_request=request,
-                    previous_response=response)
+    def list_all_records(self, **kwargs):
+        """
+        List the record sets in the zone from GCP.
 
-        return rrsets
+        :param kwargs: see GoogleCloudPlatform.list_items
+        """
+        return self.list_items(
+                self.discovery.resourceRecordSets(),
+                items_key='rrsets',
+                project=self.project,
+                managedZone=self.name,
+                **kwargs)
 
     def get(self):
         return self.discovery.managedZones().get(
             project=self.project,
             managedZone=self.name).execute()
 
+    @check_response
+    def create_change(self, additions=None, deletions=None):
+        """
+        Add and delete record sets in the zone, atomically.
+
+        :return: REST response with the change and its status
+        """
+        body = {}
+        if additions:
+            body['additions'] = additions
+        if deletions:
+            body['deletions'] = deletions
+        self.logger.info(
+            "Change DNS Zone '{0}': {1} additions, {2} deletions".format(
+                self.name, len(additions or []), len(deletions or [])))
+        return self.discovery.changes().create(
+            project=self.project,
+            managedZone=self.name,
+            body=body).execute()
+
+    def wait_for_change(self, change):
+        """
+        :return: the change, once it is no longer pending
+        """
+        if change['status'] != 'pending':
+            return change
+
+        return utils.Poller.from_config(self.config).poll(
+            self.discovery.changes().get(
+                project=self.project,
+                managedZone=self.name,
+                changeId=change['id'],
+                ).execute,
+            lambda response: response['status'] != 'pending')
+
+    def apply_change(self, additions=None, deletions=None):
+        return self.finish_change(
+            self.create_change(additions, deletions), additions, deletions)
+
+    def finish_change(self, change, additions=None, deletions=None):
+        """
+        Wait for `change`, which made `additions` and `deletions`, and
+        record them in the zone's snapshot.
+
+        :return: the change, once it is no longer pending
+        """
+        response = self.wait_for_change(change)
+        if response['status'] == 'done':
+            # GCP includes its own changes, such as to the SOA serial
+            zone_snapshots.apply(
+                self,
+                response.get('additions', additions),
+                response.get('deletions', deletions))
+        return response
+
+
+class ZoneSnapshots(object):
+    """
+    Shares the record sets of each zone between every task in this process,
+    indexed by (name, type).
+
+    A zone's records are listed once, and then kept up to date with the
+    changes made from this process. Once a snapshot is `max_age` seconds old
+    the zone's SOA serial is checked, and the records listed again only if
+    the zone has been changed elsewhere.
+    """
+
+    def __init__(self, max_age=constants.DNS_SNAPSHOT_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._snapshots = {}
+
+    def get(self, zone):
+        """
+        :return: dictionary mapping (name, type) to each of `zone`'s record
+        sets
+        """
+        key = (zone.project, zone.name)
+        # Refreshed while holding the lock so that concurrent tasks wait for
+        # one listing instead of each making their own
+        with self._lock:
+            taken, records = self._snapshots.get(key, (0, None))
+            if records is None:
+                records = self._load(zone)
+            elif time.time() - taken > self.max_age:
+                soa = list(zone.list_all_records(
+                    name=zone.dns_name, type='SOA'))
+                if get_serial(soa) != get_serial(records.values()):
+                    records = self._load(zone)
+            self._snapshots[key] = (time.time(), records)
+            return dict(records)
+
+    def apply(self, zone, additions=None, deletions=None):
+        """
+        Update the snapshot of `zone` with a change made to it
+        """
+        with self._lock:
+            taken, records = self._snapshots.get(
+                (zone.project, zone.name), (0, None))
+            if records is None:
+                return
+            for rrset in deletions or []:
+                records.pop((rrset['name'], rrset['type']), None)
+            for rrset in additions or []:
+                records[(rrset['name'], rrset['type'])] = rrset
+
+    def forget(self, zone):
+        """
+        Drop the snapshot of `zone`, e.g. when it turns out to be out of date
+        """
+        with self._lock:
+            self._snapshots.pop((zone.project, zone.name), None)
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+
+    @staticmethod
+    def _load(zone):
+        zone.logger.info(
+            "List records of DNS Zone '{0}'".format(zone.name))
+        return {
+            (rrset['name'], rrset['type']): rrset
+            for rrset in zone.list_all_records()}
+
+
+def get_serial(rrsets):
+    """
+    :return: the serial number from the SOA record among `rrsets`, or None
+    """
+    for rrset in rrsets:
+        if rrset['type'] == 'SOA':
+            return rrset['rrdatas'][0].split()[2]
+
+
+zone_snapshots = ZoneSnapshots()
+
+
+class ChangeAccumulator(utils.Coalescer):
+    """
+    Combines record set changes made to a zone by tasks running concurrently
+    in this process into a single Change, which is waited on once. A change
+    is sent straight away unless another to the zone is being sent.
+
+    Changes are atomic, so if a combined change is rejected, each task's
+    records are then changed separately. That way only the tasks whose
+    records caused the failure get the error. Once the combined change has
+    been made it is only waited on, as sending its records again would
+    repeat it.
+    """
+
+    def __init__(self,
+                 window=constants.COALESCE_WINDOW,
+                 max_size=constants.DNS_CHANGE_MAX_RRSETS):
+        super(ChangeAccumulator, self).__init__(window, max_size)
+
+    def change(self, zone, additions=(), deletions=()):
+        """
+        Queue record sets to add to and delete from `zone`.
+
+        :return: the completed change which included them
+        """
+        item = (list(additions), list(deletions))
+        results = self.submit(
+            (zone.project, zone.name), item,
+            lambda items: self.send(zone, items))
+        response, error = results[id(item)]
+        if error is not None:
+            raise error
+        return response
+
+    @staticmethod
+    def send(zone, items):
+        """
+        :return: dictionary mapping the id of each item to its
+        (response, error)
+        """
+        if len(items) > 1:
+            zone.logger.info(
+                "Combining {0} record changes to DNS Zone '{1}'".format(
+                    len(items), zone.name))
+        additions = [rrset for item in items for rrset in item[0]]
+        deletions = [rrset for item in items for rrset in item[1]]
+        try:
+            change = zone.create_change(additions, deletions)
+        except (GCPError, HttpError):
+            if len(items) == 1:
+                raise
+        else:
+            # Any error waiting for the change is every task's error
+            response = zone.finish_change(change, additions, deletions)
+            return {id(item): (response, None) for item in items}
+
+        results = {}
+        for item in items:
+            try:
+                results[id(item)] = (zone.apply_change(*item), None)
+            except (GCPError, HttpError) as e:
+                results[id(item)] = (None, e)
+        return results
+
+
+zone_changes = ChangeAccumulator()
+
 
 @operation
 @utils.throw_cloudify_exceptions
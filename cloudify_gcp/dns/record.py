@@ -13,14 +13,15 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
-from time import sleep
-
 from cloudify import ctx
 from cloudify.decorators import operation
 from cloudify.exceptions import NonRecoverableError
+from googleapiclient.errors import HttpError
 
 from .. import utils
 from .dns import DNSZone
+from .dns import zone_changes
+from .dns import zone_snapshots
 
 
 def get_current_records(zone, name=None, type=None):
@@ -29,25 +30,46 @@ def get_current_records(zone, name=None, type=None):
     return zone.list_records(name=name, type=type)
 
 
-def generate_changes(dns_zone, action, data):
+def same_rrset(first, second):
+    return (
+        str(first.get('ttl')) == str(second.get('ttl')) and
+        sorted(first['rrdatas']) == sorted(second['rrdatas']))
+
+
+def upsert(dns_zone, name, rrset):
     """
-    Produces a change request (additions, deletions) with the specified data
+    Make the zone's record set with the subdomain `name` and the type of
+    `rrset` match `rrset`, replacing any different one in a single change.
+
+    :return: the completed change, or None if nothing needed changing
     """
-    return dns_zone.discovery.changes().create(
-            project=utils.get_gcp_config()['project'],
-            managedZone=dns_zone.name,
-            body={action: data})
+    current = dns_zone.get_record(name, rrset['type'])
+    if current and same_rrset(current, rrset):
+        ctx.logger.info(
+            'DNS record {0} is already up to date'.format(rrset['name']))
+        return None
+
+    return change_records(
+        dns_zone,
+        additions=[rrset],
+        deletions=[current] if current else [])
 
 
-def wait_for_change_completion(dns_zone, response):
-    while response['status'] == 'pending':
-        sleep(3)
-        response = dns_zone.discovery.changes().get(
-                project=utils.get_gcp_config()['project'],
-                managedZone=dns_zone.name,
-                changeId=response['id'],
-                ).execute()
-    return response
+def change_records(dns_zone, additions=(), deletions=()):
+    """
+    Add and delete record sets in a change combined with any others made
+    at the same time.
+
+    :return: the completed change
+    """
+    try:
+        return zone_changes.change(
+            dns_zone, additions=additions, deletions=deletions)
+    except HttpError as e:
+        if e.resp.status in (409, 412):
+            # The records were changed elsewhere since the zone's snapshot
+            zone_snapshots.forget(dns_zone)
+        raise
 
 
 def creation_validation(*args, **kwargs):
@@ -136,17 +158,15 @@ def create(type, name, resources, ttl, **kwargs):
             item_path)
         resources.append(item)
 
-    response = generate_changes(dns_zone, 'additions', [{
+    response = upsert(dns_zone, name, {
             "name": '{}.{}'
                     .format(name, zone.runtime_properties['dnsName']),
             "ttl": ttl,
             "type": type,
             "rrdatas": resources,
-        }]).execute()
+        })
 
-    response = wait_for_change_completion(dns_zone, response)
-
-    if response['status'] != 'done':
+    if response and response['status'] != 'done':
         raise NonRecoverableError('unexpected response status: {}'.format(
             response))
 
@@ -178,9 +198,8 @@ def delete(**kwargs):
                 type=ctx.node.properties['type'],
                 )
 
-        wait_for_change_completion(
-                dns_zone,
-                generate_changes(dns_zone, 'deletions', rrsets).execute())
+        if rrsets:
+            change_records(dns_zone, deletions=rrsets)
 
         ctx.instance.runtime_properties.pop('created', None)
 
@@ -14,9 +14,15 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
-from mock import patch
+import threading
+import time
+import unittest
+
+from mock import Mock, call, patch
 
 from .. import dns
+from ... import utils
+from ...gcp import GCPError
 from ...tests import TestGCP
 
 
@@ -53,3 +59,174 @@ class TestGCPDNS(TestGCP):
         dns.delete()
 
         mock_build.assert_not_called()
+
+    def test_list_records(self, mock_build, *args):
+        mock_build().resourceRecordSets().list().execute.return_value = {
+                'rrsets': [
+                    {'name': 'a.example.com.', 'type': 'A'},
+                    {'name': 'a.example.com.', 'type': 'MX'},
+                    {'name': 'b.example.com.', 'type': 'A'},
+                    ]}
+        mock_build().resourceRecordSets().list_next.return_value = None
+        zone = dns.DNSZone(self.ctxmock.node.properties['gcp_config'],
+                           self.ctxmock.logger, 'zone', 'example.com.')
+
+        self.assertEqual(
+                [{'name': 'a.example.com.', 'type': 'MX'}],
+                zone.list_records('a', 'MX'))
+        self.assertEqual(
+                [{'name': 'a.example.com.', 'type': 'A'},
+                 {'name': 'b.example.com.', 'type': 'A'}],
+                sorted(zone.list_records(type='A'),
+                       key=lambda rrset: rrset['name']))
+        self.assertIsNone(zone.get_record('c', 'A'))
+        # Listed once, for the whole zone
+        mock_build().resourceRecordSets().list.assert_called_with(
+                project='not really a project',
+                managedZone='zone',
+                maxResults=500,
+                )
+        self.assertEqual(
+                1,
+                mock_build().resourceRecordSets().list().execute.call_count)
+
+    def test_apply_change(self, mock_build, *args):
+        mock_build().resourceRecordSets().list().execute.return_value = {
+                'rrsets': [{'name': 'a.example.com.', 'type': 'A'}]}
+        mock_build().resourceRecordSets().list_next.return_value = None
+        mock_build().changes().create().execute.return_value = {
+                'status': 'done'}
+        zone = dns.DNSZone(self.ctxmock.node.properties['gcp_config'],
+                           self.ctxmock.logger, 'zone', 'example.com.')
+        zone.list_records()
+
+        zone.apply_change(
+                additions=[{'name': 'b.example.com.', 'type': 'A'}],
+                deletions=[{'name': 'a.example.com.', 'type': 'A'}])
+
+        self.assertEqual(
+                [{'name': 'b.example.com.', 'type': 'A'}],
+                zone.list_records())
+
+    @patch('cloudify_gcp.dns.dns.time.time')
+    def test_snapshot_refresh(self, mock_time, mock_build, *args):
+        mock_time.return_value = 0
+        soa = {'name': 'example.com.', 'type': 'SOA',
+               'rrdatas': ['ns. hostmaster. 1 21600 3600 259200 300']}
+        mock_build().resourceRecordSets().list().execute.return_value = {
+                'rrsets': [soa]}
+        mock_build().resourceRecordSets().list_next.return_value = None
+        zone = dns.DNSZone(self.ctxmock.node.properties['gcp_config'],
+                           self.ctxmock.logger, 'zone', 'example.com.')
+        zone.list_records()
+
+        mock_time.return_value = 1000
+        zone.list_records()
+
+        # Only the SOA record is listed, as the serial hasn't changed
+        mock_build().resourceRecordSets().list.assert_called_with(
+                project='not really a project',
+                managedZone='zone',
+                maxResults=500,
+                name='example.com.',
+                type='SOA',
+                )
+
+
+class TestChangeAccumulator(unittest.TestCase):
+
+    def test_send(self):
+        zone = Mock()
+        zone.finish_change.return_value = 'change'
+        items = [(['a'], []), ([], ['b'])]
+
+        results = dns.ChangeAccumulator.send(zone, items)
+
+        zone.create_change.assert_called_once_with(['a'], ['b'])
+        zone.finish_change.assert_called_once_with(
+                zone.create_change(), ['a'], ['b'])
+        self.assertEqual(
+                {id(item): ('change', None) for item in items},
+                results)
+
+    def test_send_failed(self):
+        zone = Mock()
+        error = GCPError('already exists')
+        zone.create_change.side_effect = GCPError('combined')
+        zone.apply_change.side_effect = ['change', error]
+        items = [(['a'], []), (['b'], [])]
+
+        results = dns.ChangeAccumulator.send(zone, items)
+
+        zone.create_change.assert_called_once_with(['a', 'b'], [])
+        zone.apply_change.assert_has_calls([
+                call(['a'], []),
+                call(['b'], []),
+                ])
+        self.assertEqual(
+                {id(items[0]): ('change', None), id(items[1]): (None, error)},
+                results)
+
+    def test_send_wait_failed(self):
+        zone = Mock()
+        zone.finish_change.side_effect = utils.PollingTimeout('too slow')
+        items = [(['a'], []), (['b'], [])]
+
+        with self.assertRaises(utils.PollingTimeout):
+            dns.ChangeAccumulator.send(zone, items)
+
+        # The change was made, so its records aren't sent again
+        zone.create_change.assert_called_once_with(['a', 'b'], [])
+        zone.apply_change.assert_not_called()
+
+    def test_change_raises(self):
+        zone = Mock()
+        zone.create_change.side_effect = GCPError('already exists')
+        accumulator = dns.ChangeAccumulator()
+
+        with self.assertRaises(GCPError):
+            accumulator.change(zone, additions=['a'])
+
+    def test_change_alone(self):
+        zone = Mock()
+        accumulator = dns.ChangeAccumulator(window=10)
+        started = time.time()
+
+        self.assertIs(
+            zone.finish_change(), accumulator.change(zone, additions=['a']))
+
+        # No other change to the zone was in flight, so there was no wait
+        self.assertLess(time.time() - started, 5)
+        zone.create_change.assert_called_once_with(['a'], [])
+
+    def test_change_while_sending(self):
+        zone = Mock()
+        accumulator = dns.ChangeAccumulator(window=10)
+        sending = threading.Event()
+        release = threading.Event()
+
+        def finish_change(change, additions, deletions):
+            sending.set()
+            release.wait()
+        zone.finish_change.side_effect = finish_change
+
+        threads = [
+            threading.Thread(
+                target=accumulator.change, args=(zone, [rrset]))
+            for rrset in ('a', 'b', 'c')]
+        threads[0].start()
+        sending.wait()
+        threads[1].start()
+        while not accumulator._pending:
+            time.sleep(0.01)
+        threads[2].start()
+        while len(accumulator._pending[(zone.project, zone.name)].items) < 2:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([
+            call(['a'], []),
+            call(['b', 'c'], []),
+            ], zone.create_change.call_args_list)
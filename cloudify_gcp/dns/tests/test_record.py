@@ -14,10 +14,12 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
+from googleapiclient.errors import HttpError
 from mock import Mock, patch
 
 from .. import record
 from ...tests import TestGCP
+from ...tests.test_utils import NS
 
 
 @patch('cloudify_gcp.gcp.ServiceAccountCredentials.from_json_keyfile_dict')
@@ -27,7 +29,6 @@ class TestGCPRecord(TestGCP):
 
     def setUp(self):
         super(TestGCPRecord, self).setUp()
-
         rel = Mock()
         rel.type = 'cloudify.gcp.relationships.dns_record_contained_in_zone'
         rel.target.instance.runtime_properties = {
@@ -36,7 +37,14 @@ class TestGCPRecord(TestGCP):
                 }
         self.ctxmock.instance.relationships = [rel]
 
+    def set_records(self, mock_build, *rrsets):
+        mock_build().resourceRecordSets().list().execute.return_value = {
+                'rrsets': list(rrsets),
+                }
+        mock_build().resourceRecordSets().list_next.return_value = None
+
     def test_create(self, mock_build, *args):
+        self.set_records(mock_build)
         mock_build().changes().create().execute.side_effect = [
                 {'status': 'pending', 'id': u'🛂'},
                 {'status': 'done'},
@@ -67,6 +75,7 @@ class TestGCPRecord(TestGCP):
                 )
 
     def test_create_with_instance(self, mock_build, *args):
+        self.set_records(mock_build)
         mock_build().changes().create().execute.side_effect = [
                 {'status': 'done'},
                 ]
@@ -106,6 +115,46 @@ class TestGCPRecord(TestGCP):
                 project='not really a project',
                 )
 
+    def test_create_unchanged(self, mock_build, *args):
+        self.set_records(mock_build, {
+                'name': 'name.example.com.',
+                'type': 'A',
+                'ttl': 300,
+                'rrdatas': ['10.0.0.2', '10.0.0.1'],
+                })
+
+        record.create('A', 'name', ['10.0.0.1', '10.0.0.2'], 300)
+
+        mock_build().changes().create.assert_not_called()
+        self.assertTrue(self.ctxmock.instance.runtime_properties['created'])
+
+    def test_create_replaces(self, mock_build, *args):
+        current = {
+                'name': 'name.example.com.',
+                'type': 'A',
+                'ttl': 300,
+                'rrdatas': ['10.0.0.1'],
+                }
+        self.set_records(mock_build, current)
+        mock_build().changes().create().execute.return_value = {
+                'status': 'done'}
+
+        record.create('A', 'name', ['10.0.0.2'], 300)
+
+        mock_build().changes().create.assert_called_with(
+                body={
+                    'additions': [{
+                        'rrdatas': ['10.0.0.2'],
+                        'type': 'A',
+                        'name': 'name.example.com.',
+                        'ttl': 300,
+                        }],
+                    'deletions': [current],
+                    },
+                managedZone='target instance',
+                project='not really a project',
+                )
+
     def test_delete(self, mock_build, *args):
         self.ctxmock.node.properties['type'] = 'A'
         self.ctxmock.instance.runtime_properties = {
@@ -113,10 +162,12 @@ class TestGCPRecord(TestGCP):
                 'name': 'delete me',
                 }
 
-        mock_build().resourceRecordSets().list().execute.return_value = {
-                'rrsets': ['rrs'],
-                }
-        mock_build().resourceRecordSets().list_next.return_value = None
+        rrset = {'name': 'delete me.example.com.', 'type': 'A'}
+        self.set_records(
+                mock_build,
+                rrset,
+                {'name': 'delete me.example.com.', 'type': 'MX'},
+                )
 
         mock_build().changes().create().execute.side_effect = [
                 {'status': 'pending', 'id': u'🛂'},
@@ -131,11 +182,33 @@ class TestGCPRecord(TestGCP):
         record.delete()
 
         mock_build().changes().create.assert_called_with(
-                body={'deletions': ['rrs']},
+                body={'deletions': [rrset]},
                 managedZone='target instance',
                 project='not really a project',
                 )
 
+    @patch('cloudify_gcp.dns.record.zone_snapshots')
+    def test_delete_conflict(self, mock_snapshots, mock_build, *args):
+        self.ctxmock.node.properties['type'] = 'A'
+        self.ctxmock.instance.runtime_properties = {
+                'created': True,
+                'name': 'delete me',
+                }
+        self.set_records(
+                mock_build,
+                {'name': 'delete me.example.com.', 'type': 'A'},
+                )
+        mock_build().changes().create().execute.side_effect = HttpError(
+                NS(status=412), 'precondition failed')
+
+        with self.assertRaises(HttpError):
+            record.delete()
+
+        # The snapshot the deletion was based on is out of date
+        mock_snapshots.forget.assert_called_once()
+        self.assertTrue(
+                self.ctxmock.instance.runtime_properties['created'])
+
     def test_delete_deleted(self, mock_build, *args):
         record.delete()
 
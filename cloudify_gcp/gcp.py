@@ -13,12 +13,24 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
+import os
+import json
+import threading
+import time
+import calendar
+import copy
+import datetime
+import fcntl
+import hashlib
+import tempfile
+from collections import OrderedDict
 from functools import wraps
 
 import httplib2
 from Crypto.Random import atfork
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build, build_from_document
 from googleapiclient.errors import HttpError
+from oauth2client.client import Storage
 from oauth2client.service_account import ServiceAccountCredentials
 
 from . import constants
@@ -39,11 +51,231 @@ def check_response(func):
     return wraps(func)(_decorator)
 
 
+class DiscoveryCache(object):
+    """
+    Process-wide cache of authorized discovery objects.
+
+    Entries are evicted once they are older than `ttl` seconds, and the least
+    recently used entries are dropped once there are more than `max_size`.
+    """
+
+    def __init__(self,
+                 max_size=constants.DISCOVERY_CACHE_SIZE,
+                 ttl=constants.DISCOVERY_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, key, factory):
+        """
+        Return the cached object for `key`, calling `factory` to create it
+        if there is no fresh entry.
+        """
+        with self._lock:
+            entry = self._items.pop(key, None)
+            if entry and time.time() - entry[0] < self.ttl:
+                # Re-insert to mark this entry as the most recently used
+                self._items[key] = entry
+                return entry[1]
+
+        # Build outside of the lock so a slow build doesn't block
+        # unrelated lookups
+        value = factory()
+
+        with self._lock:
+            self._items[key] = (time.time(), value)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+discovery_cache = DiscoveryCache()
+
+
+def get_auth_identity(auth):
+    """
+    Produce a hashable identifier for the service account in `auth`, which
+    may be either the parsed service account JSON or a path to it.
+    """
+    if hasattr(auth, 'get'):
+        return (auth.get('client_email'), auth.get('private_key_id'))
+    return os.path.abspath(os.path.expanduser(auth))
+
+
+def get_scope_key(scope):
+    if isinstance(scope, basestring):
+        return (scope,)
+    return tuple(sorted(scope))
+
+
+class TokenCache(Storage):
+    """
+    Access tokens shared by every process on this machine, so that a token
+    is only fetched when the last one for the same service account and
+    scopes is about to expire, instead of by every task.
+
+    The tokens are kept in a file. Refreshes are serialised between
+    processes by an exclusive lock on a neighbouring file, so that the
+    first process to find a token expiring replaces it for all of them.
+    """
+
+    def __init__(self,
+                 credentials,
+                 key,
+                 path=constants.TOKEN_CACHE_PATH,
+                 margin=constants.TOKEN_REFRESH_MARGIN):
+        """
+        :param credentials: credentials whose tokens are cached
+        :param key: identifies the service account and scopes
+        :param path: file the tokens are kept in
+        :param margin: seconds before expiry that cached tokens are no
+        longer handed out
+        """
+        super(TokenCache, self).__init__(lock=threading.Lock())
+        self.credentials = credentials
+        self.key = key
+        self.path = os.path.expanduser(path)
+        self.margin = margin
+        self._lock_file = None
+
+    def acquire_lock(self):
+        super(TokenCache, self).acquire_lock()
+        try:
+            if not os.path.isdir(os.path.dirname(self.path)):
+                os.makedirs(os.path.dirname(self.path))
+            self._lock_file = open(self.path + '.lock', 'a')
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        except (IOError, OSError):
+            # Without the lock processes may both fetch a token, which only
+            # costs a request
+            self._lock_file = None
+
+    def release_lock(self):
+        if self._lock_file is not None:
+            # Closing the file releases the lock
+            self._lock_file.close()
+            self._lock_file = None
+        super(TokenCache, self).release_lock()
+
+    def locked_get(self):
+        entry = self.load().get(self.key)
+        if not entry or entry['expiry'] - self.margin <= time.time():
+            return None
+        credentials = copy.copy(self.credentials)
+        credentials.access_token = entry['access_token']
+        credentials.token_expiry = datetime.datetime.utcfromtimestamp(
+            entry['expiry'])
+        return credentials
+
+    def locked_put(self, credentials):
+        if not (credentials.access_token and credentials.token_expiry):
+            return
+        # Drop other expired tokens while we're here
+        tokens = {
+            key: entry for key, entry in self.load().items()
+            if entry['expiry'] > time.time()}
+        tokens[self.key] = {
+            'access_token': credentials.access_token,
+            'expiry': calendar.timegm(
+                credentials.token_expiry.utctimetuple()),
+            }
+        self.save(tokens)
+
+    def locked_delete(self):
+        tokens = self.load()
+        if tokens.pop(self.key, None):
+            self.save(tokens)
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def save(self, tokens):
+        # mkstemp creates the file readable only by this user, and renaming
+        # it into place means readers never see a partially written file
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path))
+            with os.fdopen(fd, 'w') as f:
+                json.dump(tokens, f)
+            os.rename(temp_path, self.path)
+        except (IOError, OSError):
+            pass
+
+
+def get_token_key(auth, scope):
+    return hashlib.sha1(json.dumps(
+        [get_auth_identity(auth), get_scope_key(scope)])).hexdigest()
+
+
+def authorize(credentials, http, margin=constants.TOKEN_REFRESH_MARGIN):
+    """
+    Authorize `http` with `credentials`, replacing the access token shortly
+    before it expires rather than waiting for a request to be refused.
+    """
+    credentials.authorize(http)
+    authorized_request = http.request
+
+    def request(*args, **kwargs):
+        expiry = credentials.token_expiry
+        if expiry and datetime.datetime.utcnow() >= (
+                expiry - datetime.timedelta(seconds=margin)):
+            # Makes the authorized request get a token first, which another
+            # process may already have fetched
+            credentials.access_token = None
+        return authorized_request(*args, **kwargs)
+
+    # Batch requests authorize each of their parts with these
+    request.credentials = credentials
+    http.request = request
+    return http
+
+
+DISCOVERY_DOCUMENTS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'discovery')
+
+_discovery_documents = {}
+
+
+def get_discovery_document(discovery, api_version):
+    """
+    Load the discovery document for `discovery` `api_version` which was
+    shipped with the plugin.
+
+    :return: the parsed document, or None if there isn't one bundled
+    """
+    key = (discovery, api_version)
+    if key not in _discovery_documents:
+        path = os.path.join(
+            DISCOVERY_DOCUMENTS_DIR,
+            '{0}.{1}.json'.format(discovery, api_version))
+        try:
+            with open(path) as f:
+                _discovery_documents[key] = json.load(f)
+        except (IOError, OSError):
+            _discovery_documents[key] = None
+    return _discovery_documents[key]
+
+
 class GoogleCloudPlatform(object):
     """
     Class using google-python-api-client library to connect to Google Cloud
     Platform.
     """
+    # Fields of the resource which the plugin relies on. When a subclass
+    # declares them, the resource is refreshed with a partial response of
+    # just these fields instead of the whole resource.
+    FIELDS = None
 
     def __init__(self, config, logger, name,
                  additional_settings=None,
@@ -81,14 +313,39 @@ class GoogleCloudPlatform(object):
         """
         if hasattr(self, '_discovery'):
             return self._discovery
-        self._discovery = self.create_discovery(
+        self._discovery = self.get_discovery(
                 self.__discovery, self.scope, self.api_version)
         return self._discovery
 
+    def get_discovery(self, discovery, scope, api_version):
+        """
+        Get a discovery object from the process-wide cache, creating it if
+        necessary.
+
+        httplib2.Http objects are not thread safe, and must not be shared
+        with a forked child, so the current process and thread are part of
+        the key.
+        """
+        key = (
+            os.getpid(),
+            threading.current_thread().ident,
+            get_auth_identity(self.auth),
+            discovery,
+            api_version,
+            get_scope_key(scope),
+            )
+        return discovery_cache.get(
+            key,
+            lambda: self.create_discovery(discovery, scope, api_version))
+
     def create_discovery(self, discovery, scope, api_version):
         """
         Create Google Cloud API discovery object and perform authentication.
 
+        The discovery document bundled with the plugin is used where there is
+        one, unless `discovery_refresh` is set in the gcp_config, in which
+        case the current document is fetched from Google.
+
         :param discovery: name of the API discovery to be created
         :param scope: scope the API discovery will have
         :param api_version: version of the API
@@ -108,13 +365,99 @@ class GoogleCloudPlatform(object):
             credentials = creds_func(
                     self.auth,
                     scopes=scope)
-            http = httplib2.Http()
-            credentials.authorize(http)
+            credentials.set_store(TokenCache(
+                credentials, get_token_key(self.auth, scope)))
+            http = authorize(credentials, httplib2.Http())
+            document = None
+            if not self.config.get(constants.DISCOVERY_REFRESH):
+                document = get_discovery_document(discovery, api_version)
+            if document:
+                return build_from_document(document, http=http)
             return build(discovery, api_version, http=http)
         except IOError as e:
             self.logger.error(str(e))
             raise GCPError(str(e))
 
+    def list_items(self, collection, items_key='items', filter=None,
+                   max_results=constants.MAX_RESULTS, fields=None, **kwargs):
+        """
+        Generate every item from a paginated list request. Pages are only
+        fetched as they are needed.
+
+        :param collection: API collection to call `list` on, e.g.
+        `self.discovery.firewalls()`
+        :param items_key: key holding the items in each page of the response
+        :param filter: server-side filter expression
+        :param max_results: page size
+        :param fields: fields of each item to fetch, e.g. 'name,selfLink'.
+        All fields are fetched by default
+        :param kwargs: other arguments for the list request
+        """
+        if filter:
+            kwargs['filter'] = filter
+        if max_results:
+            kwargs['maxResults'] = max_results
+        if fields:
+            kwargs['fields'] = 'nextPageToken,{0}({1})'.format(
+                items_key, fields)
+
+        request = collection.list(**kwargs)
+        while request is not None:
+            response = request.execute()
+            if 'error' in response:
+                self.logger.error('Response with error {0}'
+                                  .format(response['error']))
+                raise GCPError(response['error'])
+            for item in response.get(items_key, []):
+                yield item
+            request = collection.list_next(request, response)
+
+    def execute_batch(self, requests, callback=None, errback=None):
+        """
+        Execute several requests using as few HTTP round trips as possible.
+
+        All of the requests must be for the same API as this object.
+
+        :param requests: dictionary mapping an identifier to an unexecuted
+        request
+        :param callback: function called with (identifier, response) for each
+        successful request
+        :param errback: function called with (identifier, exception) for each
+        failed request. If it isn't given the first error is raised instead
+        :return: dictionary mapping each identifier to its response
+        :raise: the first error encountered, once every response has been
+        handled
+        """
+        responses = {}
+        errors = []
+
+        def _callback(request_id, response, exception):
+            if exception is None and 'error' in response:
+                self.logger.error('Response with error {0}'
+                                  .format(response['error']))
+                exception = GCPError(response['error'])
+            if exception is not None:
+                if errback:
+                    errback(request_id, exception)
+                else:
+                    errors.append(exception)
+                return
+            responses[request_id] = response
+            if callback:
+                callback(request_id, response)
+
+        items = list(requests.items())
+        for start in range(0, len(items), constants.MAX_BATCH_SIZE):
+            batch = self.discovery.new_batch_http_request(callback=_callback)
+            for request_id, request in items[
+                    start:start + constants.MAX_BATCH_SIZE]:
+                batch.add(request, request_id=request_id)
+            batch.execute()
+
+        if errors:
+            raise errors[0]
+        return responses
+
     def get_common_instance_metadata(self):
         """
         Get project's common instance metadata.
@@ -143,3 +486,10 @@ def is_missing_resource_error(error):
 
 def is_resource_used_error(error):
     return isinstance(error, HttpError) and error.resp.status == 400
+
+
+def is_rate_limit_error(error):
+    return isinstance(error, HttpError) and (
+        error.resp.status == 429 or
+        (error.resp.status == 403 and
+         'ratelimitexceeded' in error.content.lower()))
@@ -12,13 +12,25 @@
 #    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
+import base64
+import hashlib
+import os
+import threading
+import time
+from Queue import Empty, Queue
+
+from cloudify.exceptions import RecoverableError
 from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaIoBaseUpload
+from googleapiclient.http import MediaUpload
 from googleapiclient.http import HttpError
 
 from . import constants
 from .gcp import check_response
 from .gcp import GoogleCloudPlatform
 from .gcp import GCPError
+from .gcp import is_missing_resource_error
+from .gcp import is_rate_limit_error
 
 
 class Object(GoogleCloudPlatform):
@@ -26,7 +38,8 @@ class Object(GoogleCloudPlatform):
                  config,
                  logger,
                  name,
-                 bucket=None):
+                 bucket=None,
+                 metadata=None):
         """
         Create GCP Storage object
 
@@ -35,6 +48,8 @@ class Object(GoogleCloudPlatform):
         :param name: name of the Object to save in the Cloud Storage
         :param bucket: name of the bucket to store Object in,
         if other than project name
+        :param metadata: custom metadata to store with the Object when it is
+        uploaded
         """
         super(Object, self).__init__(config,
                                      logger,
@@ -43,25 +58,456 @@ class Object(GoogleCloudPlatform):
                                      discovery=constants.STORAGE_DISCOVERY)
         self.config = config
         self.bucket = bucket if bucket else self.project
+        self.metadata = metadata
+
+    @check_response
+    def get(self, fields=None):
+        return self.discovery.objects().get(bucket=self.bucket,
+                                            object=self.name,
+                                            fields=fields).execute()
+
+    def get_if_exists(self, fields=None):
+        """
+        :return: the object, or None if there is no such object
+        """
+        try:
+            return self.get(fields=fields)
+        except HttpError as e:
+            if is_missing_resource_error(e):
+                return None
+            raise
+
+    def content_md5(self, fields='md5Hash,metadata'):
+        """
+        :return: the base64 encoded MD5 digest of the object's content, or
+        None if the object doesn't exist or its digest isn't known
+        """
+        existing = self.get_if_exists(fields=fields)
+        if existing:
+            return existing.get('md5Hash') or existing.get(
+                'metadata', {}).get(MD5_METADATA_KEY)
+
+    def upload_to_bucket(self, path, session=None, checkpoint=None):
+        """
+        Upload the file at `path` to the bucket.
+
+        Files larger than the `composite_threshold` in the gcp_config's
+        `upload` section are split into parts of `part_size`, which are
+        uploaded `workers` at a time and then composed into the object.
+        Smaller files are uploaded in one resumable upload. Either can be
+        resumed after an interruption.
+
+        :param session: see `upload` and `composite_upload`
+        :param checkpoint: see `upload` and `composite_upload`
+        :return: URL of the uploaded object
+        """
+        settings = self.config.get(constants.UPLOAD, {})
+        part_size = settings.get('part_size', constants.UPLOAD_PART_SIZE)
+        workers = settings.get('workers', constants.UPLOAD_WORKERS)
+        threshold = settings.get(
+            'composite_threshold', constants.UPLOAD_COMPOSITE_THRESHOLD)
+
+        if workers > 1 and os.path.getsize(path) > threshold:
+            return self.composite_upload(
+                path, part_size, workers, session, checkpoint)
 
-    def upload_to_bucket(self, path):
         media = MediaFileUpload(path,
                                 chunksize=constants.CHUNKSIZE,
                                 resumable=True)
+        return self.upload(media, session, checkpoint)['selfLink']
+
+    def upload_stream(self, chunks, session=None, checkpoint=None):
+        """
+        Upload content as it is generated, without knowing its size in
+        advance.
+
+        :param chunks: iterable of the content, in pieces of any size. To
+        resume an upload using `session` it must produce the same content
+        again
+        :param session: see `upload`
+        :param checkpoint: see `upload`
+        :return: URL of the uploaded object
+        """
+        media = StreamUpload(chunks, chunksize=constants.CHUNKSIZE)
+        return self.upload(media, session, checkpoint)['selfLink']
+
+    def upload(self, media, session=None, checkpoint=None):
+        """
+        Upload `media` as this object, in chunks sized to the throughput.
+
+        :param session: dictionary in which the upload session and its
+        progress are recorded. Passing it again resumes an interrupted upload
+        of the same media from where it stopped
+        :param checkpoint: function called each time `session` is updated
+        :return: the uploaded object
+        :raise: RecoverableError if GCS fails or rate limits a chunk, so
+        that a retry of the task resumes the upload using `session`
+        """
+        if session is None:
+            session = {}
+        kwargs = {}
+        if self.metadata:
+            kwargs['body'] = {'metadata': self.metadata}
         request = self.discovery.objects().insert(bucket=self.bucket,
                                                   name=self.name,
-                                                  media_body=media)
+                                                  media_body=media,
+                                                  **kwargs)
+        resuming = session.get('uri') and session.get('size') == media.size()
+        if resuming:
+            self.logger.info(
+                'Resume upload of {0} from byte {1}'.format(
+                    self.name, session.get('offset', 0)))
+            request.resumable_uri = session['uri']
+            request.resumable_progress = session.get('offset', 0)
+            # Makes the next chunk start by asking GCS how much it has
+            request._in_error_state = True
+
         response = None
         while response is None:
+            started = time.time()
             try:
                 _, response = request.next_chunk()
             except HttpError as e:
-                raise GCPError(e.message)
-        return response['selfLink']
+                if resuming and e.resp.status in (404, 410):
+                    self.logger.info(
+                        'Upload session expired, starting again')
+                    session.clear()
+                    return self.upload(media, session, checkpoint)
+                message = 'Upload of {0} failed with {1}: {2}'.format(
+                    self.name, e.resp.status, e.content)
+                if e.resp.status >= 500 or is_rate_limit_error(e):
+                    raise RecoverableError(
+                        message, retry_after=constants.RETRY_DEFAULT_DELAY)
+                raise GCPError(message)
+
+            if response is None:
+                session.update({
+                    'uri': request.resumable_uri,
+                    'offset': request.resumable_progress,
+                    'size': media.size(),
+                    })
+                if checkpoint:
+                    checkpoint()
+                media._chunksize = adapt_chunk_size(
+                    media.chunksize(), time.time() - started)
+        return response
+
+    def composite_upload(self, path, part_size, workers, session=None,
+                         checkpoint=None):
+        """
+        Upload the file at `path` as several parts at once, and compose them
+        into this object. The parts are deleted afterwards.
+
+        :param session: dictionary in which the upload session of each part
+        is recorded, under `parts`. Passing it again skips the parts which
+        were finished, and resumes the others from where they stopped
+        :param checkpoint: function called each time `session` is updated.
+        It is only called from the calling thread
+        :return: URL of the uploaded object
+        """
+        if session is None:
+            session = {}
+        size = os.path.getsize(path)
+        if (session.get('parts') is None or
+                session.get('part_size') != part_size or
+                session.get('size') != size):
+            session.clear()
+            session.update({'part_size': part_size, 'size': size, 'parts': {}})
+        offsets = range(0, size, part_size)
+        parts = [
+            Object(self.config, self.logger,
+                   '{0}.part{1}'.format(self.name, index), self.bucket)
+            for index in range(len(offsets))]
+        pending = [
+            index for index in range(len(parts))
+            if not session['parts'].get(str(index), {}).get('done')]
+        self.logger.info(
+            'Upload {0} to {1} in {2} parts, {3} of them left'.format(
+                path, self.name, len(parts), len(pending)))
+
+        def upload_part(index, updates):
+            # Each part records its progress in its own copy, which is only
+            # put into `session` by the calling thread
+            part_session = dict(session['parts'].get(str(index), {}))
+            part_file = FilePart(path, offsets[index], part_size)
+            try:
+                parts[index].upload(
+                    MediaIoBaseUpload(
+                        part_file,
+                        mimetype='application/octet-stream',
+                        chunksize=constants.CHUNKSIZE,
+                        resumable=True),
+                    part_session,
+                    lambda: updates.put((index, dict(part_session))))
+            finally:
+                part_file.close()
+            updates.put((index, {'done': True}))
+
+        def record(update):
+            index, part_session = update
+            session['parts'][str(index)] = part_session
+            if checkpoint:
+                checkpoint()
+
+        temporary = list(parts)
+        try:
+            run_in_threads(upload_part, pending, workers, record)
+            url = self.compose(parts, temporary)['selfLink']
+        except RecoverableError:
+            # The finished parts are kept for the retry
+            raise
+        except Exception:
+            # The parts are deleted, so another upload has to start again
+            session.clear()
+            if checkpoint:
+                checkpoint()
+            self.delete_objects(temporary)
+            raise
+        self.delete_objects(temporary)
+        return url
+
+    def compose(self, sources, temporary):
+        """
+        Compose this object from `sources`, in order.
+
+        As a compose request only accepts a limited number of sources, more
+        sources are first composed into intermediate objects, which are
+        added to `temporary`.
+        """
+        level = 0
+        while len(sources) > constants.MAX_COMPOSE_SOURCES:
+            level += 1
+            groups = [
+                sources[start:start + constants.MAX_COMPOSE_SOURCES]
+                for start in range(
+                    0, len(sources), constants.MAX_COMPOSE_SOURCES)]
+            sources = [
+                Object(self.config, self.logger,
+                       '{0}.compose{1}-{2}'.format(self.name, level, index),
+                       self.bucket)
+                for index in range(len(groups))]
+            temporary.extend(sources)
+            for source, group in zip(sources, groups):
+                source.compose_request(group).execute()
+
+        return self.compose_request(sources).execute()
+
+    def compose_request(self, sources):
+        destination = {'contentType': 'application/octet-stream'}
+        if self.metadata:
+            destination['metadata'] = self.metadata
+        return self.discovery.objects().compose(
+            destinationBucket=self.bucket,
+            destinationObject=self.name,
+            body={
+                'sourceObjects': [{'name': source.name}
+                                  for source in sources],
+                'destination': destination,
+            })
+
+    def delete_objects(self, objects):
+        def errback(name, error):
+            self.logger.warning(
+                'Unable to delete temporary object {0}: {1}'.format(
+                    name, error))
+
+        self.execute_batch(
+            {obj.name: self.discovery.objects().delete(
+                bucket=obj.bucket, object=obj.name)
+             for obj in objects},
+            errback=errback)
 
     def delete(self):
         return self.discovery.objects().delete(bucket=self.bucket,
-                                               name=self.name).execute()
+                                               object=self.name).execute()
+
+
+# Composite objects have no md5Hash, so the digest of the uploaded content
+# is kept in their metadata instead
+MD5_METADATA_KEY = 'cloudify-md5'
+
+
+def file_md5(path):
+    """
+    :return: the base64 encoded MD5 digest of the file at `path`, in the
+    form GCS gives an object's md5Hash
+    """
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(constants.CHUNKSIZE), b''):
+            digest.update(block)
+    return base64.b64encode(digest.digest())
+
+
+class StreamUpload(MediaUpload):
+    """
+    Resumable upload of the content produced by an iterable.
+
+    Only the current chunk is held in memory. As GCS can ask for a chunk to
+    be sent again from any point after the last one it received, the chunk
+    is kept until the next is asked for.
+    """
+
+    def __init__(self, chunks, mimetype='application/octet-stream',
+                 chunksize=constants.CHUNKSIZE):
+        super(StreamUpload, self).__init__()
+        self._chunks = iter(chunks)
+        self._mimetype = mimetype
+        self._chunksize = chunksize
+        self._buffer = b''
+        # Position in the content of the start of the buffer
+        self._buffer_start = 0
+
+    def chunksize(self):
+        return self._chunksize
+
+    def mimetype(self):
+        return self._mimetype
+
+    def size(self):
+        # Not known until the content has all been produced
+        return None
+
+    def resumable(self):
+        return True
+
+    def has_stream(self):
+        return False
+
+    def getbytes(self, begin, length):
+        if begin < self._buffer_start:
+            raise GCPError(
+                'Upload stream can not go back to byte {0}'.format(begin))
+
+        # Drop what GCS already has. When resuming an upload that can be
+        # more than has been produced so far
+        while self._buffer_start + len(self._buffer) < begin:
+            self._buffer_start += len(self._buffer)
+            self._buffer = next(self._chunks, None)
+            if self._buffer is None:
+                raise GCPError(
+                    'Upload stream ended before byte {0}'.format(begin))
+        self._buffer = self._buffer[begin - self._buffer_start:]
+        self._buffer_start = begin
+
+        pieces = [self._buffer]
+        buffered = len(self._buffer)
+        while buffered < length:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            pieces.append(chunk)
+            buffered += len(chunk)
+        self._buffer = b''.join(pieces)
+        return self._buffer[:length]
+
+
+class FilePart(object):
+    """
+    Read-only file object for the part of the file at `path` which is
+    `length` bytes long, starting at `offset`.
+    """
+
+    def __init__(self, path, offset, length):
+        self._file = open(path, 'rb')
+        self.offset = offset
+        self.length = min(length, os.path.getsize(path) - offset)
+        self._position = 0
+
+    def seek(self, position, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            position += self._position
+        elif whence == os.SEEK_END:
+            position += self.length
+        self._position = min(max(position, 0), self.length)
+
+    def tell(self):
+        return self._position
+
+    def read(self, size=-1):
+        remaining = self.length - self._position
+        if size < 0 or size > remaining:
+            size = remaining
+        self._file.seek(self.offset + self._position)
+        data = self._file.read(size)
+        self._position += len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+def adapt_chunk_size(chunk_size, elapsed):
+    """
+    Choose the size of the next chunk of an upload, given that the last one
+    of `chunk_size` took `elapsed` seconds.
+    """
+    if elapsed < constants.UPLOAD_CHUNK_SECONDS / 2.0:
+        chunk_size *= 2
+    elif elapsed > constants.UPLOAD_CHUNK_SECONDS * 2:
+        chunk_size //= 2
+    return min(max(chunk_size, constants.MIN_CHUNKSIZE),
+               constants.MAX_CHUNKSIZE)
+
+
+def run_in_threads(func, items, workers, on_update=None):
+    """
+    Call `func` with each of `items`, using up to `workers` threads.
+
+    httplib2 isn't thread safe, so `func` must not share GoogleCloudPlatform
+    objects between threads.
+
+    :param func: called with an item and a Queue, on which it can put
+    updates about its progress
+    :param on_update: called with each update in the calling thread, as
+    the updates arrive
+    :raise: the first error raised by `func` or `on_update`, once every
+    thread has finished
+    """
+    queue = Queue()
+    for item in items:
+        queue.put(item)
+    updates = Queue()
+    errors = []
+
+    def worker():
+        try:
+            while not errors:
+                try:
+                    item = queue.get_nowait()
+                except Empty:
+                    return
+                try:
+                    func(item, updates)
+                except Exception as e:
+                    errors.append(e)
+        finally:
+            updates.put(_WORKER_FINISHED)
+
+    threads = [threading.Thread(target=worker)
+               for _ in range(min(workers, queue.qsize()))]
+    for thread in threads:
+        thread.start()
+
+    finished = 0
+    while finished < len(threads):
+        update = updates.get()
+        if update is _WORKER_FINISHED:
+            finished += 1
+        elif on_update:
+            try:
+                on_update(update)
+            except Exception as e:
+                errors.append(e)
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+
+# Put on the updates queue by each run_in_threads worker as it stops
+_WORKER_FINISHED = object()
 
 
 class Bucket(GoogleCloudPlatform):
@@ -93,8 +539,6 @@ class Bucket(GoogleCloudPlatform):
     def delete(self):
         return self.discovery.buckets().delete(bucket=self.name).execute()
 
-    @check_response
-    def list(self):
-        response = self.discovery.buckets().list(
-            project=self.project).execute()
-        return response['items']
+    def list(self, **kwargs):
+        return self.list_items(
+            self.discovery.buckets(), project=self.project, **kwargs)
@@ -15,17 +15,47 @@
 
 import unittest
 
-from mock import Mock
+from mock import Mock, patch
 
 from cloudify.state import current_ctx
 from cloudify.manager import DirtyTrackingDict
 
+from cloudify_gcp.dns.dns import zone_snapshots
+from cloudify_gcp.gcp import discovery_cache
+from cloudify_gcp.utils import operation_watcher
+
+
+def fake_batch(callback):
+    """
+    Stand-in for `new_batch_http_request` which executes each request when
+    the batch is executed.
+    """
+    requests = []
+    batch = Mock()
+    batch.add.side_effect = (
+        lambda request, request_id: requests.append((request_id, request)))
+    batch.execute.side_effect = lambda: [
+        callback(request_id, request.execute(), None)
+        for request_id, request in requests]
+    return batch
+
 
 class TestGCP(unittest.TestCase):
 
     def setUp(self):
         super(TestGCP, self).setUp()
 
+        # Each test patches `build`, so don't hand out the previous one's mock
+        discovery_cache.clear()
+        operation_watcher.clear()
+        zone_snapshots.clear()
+
+        # and build it from `build` rather than a bundled discovery document
+        patcher = patch('cloudify_gcp.gcp.get_discovery_document',
+                        return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
         ctx = self.ctxmock = Mock()
         ctx.node.name = 'name'
         ctx.node.id = 'id'
@@ -15,13 +15,22 @@
 
 from __future__ import print_function
 
+import datetime
+import os
+import shutil
+import tempfile
+import time
 import unittest
 from mock import MagicMock, patch
 
+from googleapiclient.discovery import build_from_document
 from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpMockSequence
+from oauth2client.client import AccessTokenCredentials
 
+from cloudify_gcp.tests import fake_batch
 from cloudify_gcp.tests.test_utils import NS
-from cloudify_gcp import gcp
+from cloudify_gcp import constants, gcp
 
 
 class TestGCP(unittest.TestCase):
@@ -83,3 +92,343 @@ class TestGCP(unittest.TestCase):
             self.assertIs(
                     gcp.is_resource_used_error(exception),
                     output)
+
+
+class TestDiscoveryCache(unittest.TestCase):
+
+    def test_get_reuses_entry(self):
+        cache = gcp.DiscoveryCache()
+        factory = MagicMock()
+
+        first = cache.get('key', factory)
+        second = cache.get('key', factory)
+
+        self.assertIs(first, second)
+        factory.assert_called_once_with()
+
+    def test_get_expired(self):
+        cache = gcp.DiscoveryCache(ttl=10)
+        factory = MagicMock(side_effect=['old', 'new'])
+
+        with patch('cloudify_gcp.gcp.time.time', return_value=100):
+            self.assertEqual('old', cache.get('key', factory))
+        with patch('cloudify_gcp.gcp.time.time', return_value=111):
+            self.assertEqual('new', cache.get('key', factory))
+
+    def test_get_evicts_least_recently_used(self):
+        cache = gcp.DiscoveryCache(max_size=2)
+
+        cache.get('a', lambda: 'a')
+        cache.get('b', lambda: 'b')
+        cache.get('a', lambda: 'not used')
+        cache.get('c', lambda: 'c')
+
+        self.assertEqual(2, len(cache))
+        self.assertEqual('a', cache.get('a', lambda: 'not cached'))
+        self.assertEqual('b again', cache.get('b', lambda: 'b again'))
+
+    @patch('cloudify_gcp.gcp.GoogleCloudPlatform.create_discovery')
+    def test_discovery_shared_between_objects(self, mock_discovery):
+        gcp.discovery_cache.clear()
+        config = {
+            'auth': {'client_email': 'a@b', 'private_key_id': '1'},
+            'project': 'project',
+            'zone': 'zone',
+            }
+
+        first = gcp.GoogleCloudPlatform(config, MagicMock(), 'first')
+        second = gcp.GoogleCloudPlatform(config, MagicMock(), 'second')
+        storage = gcp.GoogleCloudPlatform(
+                config, MagicMock(), 'storage',
+                scope=gcp.constants.STORAGE_SCOPE_RW,
+                discovery=gcp.constants.STORAGE_DISCOVERY)
+
+        self.assertIs(first.discovery, second.discovery)
+        storage.discovery
+        self.assertEqual(2, mock_discovery.call_count)
+
+
+@patch('cloudify_gcp.gcp.ServiceAccountCredentials.from_json_keyfile_dict')
+@patch('cloudify_gcp.gcp.build')
+@patch('cloudify_gcp.gcp.build_from_document')
+@patch('cloudify_gcp.gcp.get_discovery_document')
+class TestCreateDiscovery(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            'auth': {'client_email': 'a@b', 'private_key_id': '1'},
+            'project': 'project',
+            'zone': 'zone',
+            }
+
+    def create(self):
+        instance = gcp.GoogleCloudPlatform(self.config, MagicMock(), 'name')
+        return instance.create_discovery('compute', 'scope', 'v1')
+
+    def test_bundled_document(self, mock_document, mock_from_doc, mock_build,
+                              *args):
+        self.assertIs(mock_from_doc(), self.create())
+
+        mock_document.assert_called_once_with('compute', 'v1')
+        mock_build.assert_not_called()
+
+    def test_no_bundled_document(self, mock_document, mock_from_doc,
+                                 mock_build, *args):
+        mock_document.return_value = None
+
+        self.assertIs(mock_build(), self.create())
+
+        mock_from_doc.assert_not_called()
+
+    def test_refresh(self, mock_document, mock_from_doc, mock_build, *args):
+        self.config['discovery_refresh'] = True
+
+        self.assertIs(mock_build(), self.create())
+
+        mock_document.assert_not_called()
+
+
+class TestDiscoveryDocuments(unittest.TestCase):
+
+    def test_bundled(self):
+        for discovery, api_version in [
+                (constants.COMPUTE_DISCOVERY, constants.API_V1),
+                (constants.COMPUTE_DISCOVERY, constants.API_BETA),
+                (constants.STORAGE_DISCOVERY, constants.API_V1),
+                (constants.DNS_DISCOVERY, constants.API_V1),
+                ]:
+            document = gcp.get_discovery_document(discovery, api_version)
+
+            self.assertEqual(discovery, document['name'])
+            self.assertEqual(api_version, document['version'])
+
+
+class FakeCredentials(object):
+    access_token = None
+    token_expiry = None
+
+
+class TestTokenCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'tokens')
+
+    def cache(self, key='key'):
+        return gcp.TokenCache(FakeCredentials(), key, path=self.path)
+
+    def put(self, cache, token, expires_in):
+        credentials = FakeCredentials()
+        credentials.access_token = token
+        credentials.token_expiry = (
+            datetime.datetime.utcnow() +
+            datetime.timedelta(seconds=expires_in))
+        cache.acquire_lock()
+        try:
+            cache.locked_put(credentials)
+        finally:
+            cache.release_lock()
+
+    def test_shared(self):
+        self.put(self.cache(), 'token', 3600)
+
+        # e.g. in another process
+        credentials = self.cache().get()
+
+        self.assertEqual('token', credentials.access_token)
+        self.assertGreater(
+            credentials.token_expiry, datetime.datetime.utcnow())
+
+    def test_keyed(self):
+        self.put(self.cache(), 'token', 3600)
+
+        self.assertIsNone(self.cache('other').get())
+
+    def test_expiring(self):
+        self.put(self.cache(), 'token', 60)
+
+        self.assertIsNone(self.cache().get())
+
+    def test_token_key(self):
+        self.assertEqual(
+            gcp.get_token_key({'client_email': 'a@b'}, ['b', 'a']),
+            gcp.get_token_key({'client_email': 'a@b'}, ['a', 'b']))
+        self.assertNotEqual(
+            gcp.get_token_key({'client_email': 'a@b'}, 'a'),
+            gcp.get_token_key({'client_email': 'c@d'}, 'a'))
+
+
+BATCH_RESPONSE = '\r\n'.join([
+    '--batch_boundary',
+    'Content-Type: application/http',
+    'Content-ID: <response-base+fw>',
+    '',
+    'HTTP/1.1 200 OK',
+    'Content-Type: application/json',
+    '',
+    '{"name": "fw"}',
+    '--batch_boundary--',
+    ])
+
+
+class TestAuthorize(unittest.TestCase):
+
+    def test_refresh_before_expiry(self):
+        credentials = FakeCredentials()
+        credentials.authorize = lambda http: None
+        credentials.access_token = 'token'
+        credentials.token_expiry = datetime.datetime.utcfromtimestamp(
+            time.time() + 60)
+        http = MagicMock()
+
+        gcp.authorize(credentials, http).request('uri')
+
+        self.assertIsNone(credentials.access_token)
+
+    def test_valid(self):
+        credentials = FakeCredentials()
+        credentials.authorize = lambda http: None
+        credentials.access_token = 'token'
+        credentials.token_expiry = datetime.datetime.utcfromtimestamp(
+            time.time() + 3600)
+        http = MagicMock()
+
+        gcp.authorize(credentials, http).request('uri')
+
+        self.assertEqual('token', credentials.access_token)
+
+    def test_batch(self):
+        credentials = AccessTokenCredentials('token', 'agent')
+        http = HttpMockSequence([(
+            {'status': '200',
+             'content-type': 'multipart/mixed; boundary="batch_boundary"'},
+            BATCH_RESPONSE)])
+        bodies = []
+        send = http.request
+
+        def record(uri, method='GET', body=None, *args, **kwargs):
+            bodies.append(body)
+            return send(uri, method, body, *args, **kwargs)
+        http.request = record
+
+        gcp.authorize(credentials, http)
+
+        self.assertIs(credentials, http.request.credentials)
+
+        instance = gcp.GoogleCloudPlatform(
+            {'auth': {}, 'project': 'project', 'zone': 'zone'},
+            MagicMock(), 'name')
+        instance._discovery = build_from_document(
+            gcp.get_discovery_document('compute', 'v1'), http=http)
+        responses = instance.execute_batch({
+            'fw': instance.discovery.firewalls().get(
+                project='project', firewall='fw')})
+
+        self.assertEqual({'fw': {'name': 'fw'}}, responses)
+        self.assertIn('Authorization: Bearer token', bodies[0])
+
+
+@patch('cloudify_gcp.gcp.GoogleCloudPlatform.discovery')
+class TestExecuteBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.instance = gcp.GoogleCloudPlatform(
+                config=MagicMock(),
+                logger=MagicMock(),
+                name='fred')
+
+    def test_execute_batch(self, mock_discovery):
+        mock_discovery.new_batch_http_request.side_effect = fake_batch
+        callback = MagicMock()
+        requests = {'a': MagicMock(), 'b': MagicMock()}
+        requests['a'].execute.return_value = {'name': 'a'}
+        requests['b'].execute.return_value = {'name': 'b'}
+
+        responses = self.instance.execute_batch(requests, callback)
+
+        self.assertEqual({'a': {'name': 'a'}, 'b': {'name': 'b'}}, responses)
+        callback.assert_any_call('a', {'name': 'a'})
+        callback.assert_any_call('b', {'name': 'b'})
+        mock_discovery.new_batch_http_request.assert_called_once()
+
+    @patch('cloudify_gcp.gcp.constants.MAX_BATCH_SIZE', 2)
+    def test_execute_batch_split(self, mock_discovery):
+        mock_discovery.new_batch_http_request.side_effect = fake_batch
+        requests = {n: MagicMock() for n in range(5)}
+
+        self.instance.execute_batch(requests)
+
+        self.assertEqual(3, mock_discovery.new_batch_http_request.call_count)
+
+    def test_execute_batch_error(self, mock_discovery):
+        mock_discovery.new_batch_http_request.side_effect = fake_batch
+        callback = MagicMock()
+        requests = {'a': MagicMock(), 'b': MagicMock()}
+        requests['a'].execute.return_value = {'name': 'a'}
+        requests['b'].execute.return_value = {'error': 'broken'}
+
+        with self.assertRaises(gcp.GCPError):
+            self.instance.execute_batch(requests, callback)
+
+        callback.assert_called_once_with('a', {'name': 'a'})
+
+    def test_execute_batch_errback(self, mock_discovery):
+        mock_discovery.new_batch_http_request.side_effect = fake_batch
+        errback = MagicMock()
+        requests = {'a': MagicMock()}
+        requests['a'].execute.return_value = {'error': 'broken'}
+
+        self.assertEqual({}, self.instance.execute_batch(
+            requests, errback=errback))
+
+        self.assertEqual('a', errback.call_args[0][0])
+        self.assertIsInstance(errback.call_args[0][1], gcp.GCPError)
+
+
+class TestListItems(unittest.TestCase):
+
+    def setUp(self):
+        self.instance = gcp.GoogleCloudPlatform(
+                config=MagicMock(),
+                logger=MagicMock(),
+                name='fred')
+        self.collection = MagicMock()
+        self.collection.list().execute.side_effect = [
+                {'items': [1, 2], 'nextPageToken': 'next'},
+                {'items': [3]},
+                ]
+        self.collection.list_next.side_effect = [self.collection.list(), None]
+
+    def test_list_items(self):
+        self.assertEqual(
+                [1, 2, 3],
+                list(self.instance.list_items(self.collection, project='p')))
+
+        self.collection.list.assert_called_with(project='p', maxResults=500)
+
+    def test_list_items_lazy(self):
+        items = self.instance.list_items(self.collection)
+
+        self.assertEqual(1, next(items))
+        self.assertEqual(1, self.collection.list().execute.call_count)
+
+    def test_list_items_arguments(self):
+        list(self.instance.list_items(
+                self.collection,
+                items_key='rrsets',
+                filter='name eq fred',
+                max_results=10,
+                fields='name,selfLink',
+                ))
+
+        self.collection.list.assert_called_with(
+                filter='name eq fred',
+                maxResults=10,
+                fields='nextPageToken,rrsets(name,selfLink)')
+
+    def test_list_items_error(self):
+        self.collection.list().execute.side_effect = [{'error': 'nope'}]
+
+        with self.assertRaises(gcp.GCPError):
+            list(self.instance.list_items(self.collection))
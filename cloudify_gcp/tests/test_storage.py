@@ -0,0 +1,261 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import tempfile
+import threading
+import unittest
+
+from mock import ANY, Mock, patch
+
+from cloudify.exceptions import RecoverableError
+from googleapiclient.errors import HttpError
+
+from cloudify_gcp import storage
+from cloudify_gcp.tests.test_utils import NS
+from . import TestGCP, fake_batch
+
+
+@patch('cloudify_gcp.gcp.ServiceAccountCredentials.from_json_keyfile_dict')
+@patch('cloudify_gcp.gcp.build')
+class TestObject(TestGCP):
+
+    def setUp(self):
+        super(TestObject, self).setUp()
+        fd, self.path = tempfile.mkstemp()
+        os.write(fd, b'0123456789')
+        os.close(fd)
+        self.config = dict(self.ctxmock.node.properties['gcp_config'])
+
+    def tearDown(self):
+        os.remove(self.path)
+        super(TestObject, self).tearDown()
+
+    def test_upload(self, mock_build, *args):
+        mock_build().objects().insert().next_chunk.return_value = (
+            None, {'selfLink': 'link'})
+        obj = storage.Object(self.config, Mock(), 'name')
+
+        self.assertEqual('link', obj.upload_to_bucket(self.path))
+
+        mock_build().objects().insert.assert_called_with(
+            bucket='not really a project',
+            name='name',
+            media_body=ANY)
+        mock_build().objects().compose.assert_not_called()
+
+    @patch('cloudify_gcp.constants.MAX_COMPOSE_SOURCES', 2)
+    def test_composite_upload(self, mock_build, *args):
+        mock_build().new_batch_http_request.side_effect = fake_batch
+        mock_build().objects().insert().next_chunk.return_value = (
+            None, {'selfLink': 'part'})
+        mock_build().objects().compose().execute.return_value = {
+            'selfLink': 'link'}
+        self.config['upload'] = {
+            'part_size': 4,
+            'workers': 2,
+            'composite_threshold': 4,
+            }
+        obj = storage.Object(self.config, Mock(), 'name')
+
+        self.assertEqual('link', obj.upload_to_bucket(self.path))
+
+        for index in range(3):
+            mock_build().objects().insert.assert_any_call(
+                bucket='not really a project',
+                name='name.part{0}'.format(index),
+                media_body=ANY)
+        # Three parts are too many for one compose
+        mock_build().objects().compose.assert_any_call(
+            destinationBucket='not really a project',
+            destinationObject='name.compose1-0',
+            body={
+                'sourceObjects': [{'name': 'name.part0'},
+                                  {'name': 'name.part1'}],
+                'destination': {'contentType': 'application/octet-stream'},
+                })
+        mock_build().objects().compose.assert_called_with(
+            destinationBucket='not really a project',
+            destinationObject='name',
+            body={
+                'sourceObjects': [{'name': 'name.compose1-0'},
+                                  {'name': 'name.compose1-1'}],
+                'destination': {'contentType': 'application/octet-stream'},
+                })
+        for name in ('name.part0', 'name.part1', 'name.part2',
+                     'name.compose1-0', 'name.compose1-1'):
+            mock_build().objects().delete.assert_any_call(
+                bucket='not really a project', object=name)
+
+    def test_composite_upload_resume(self, mock_build, *args):
+        mock_build().new_batch_http_request.side_effect = fake_batch
+        mock_build().objects().compose().execute.return_value = {
+            'selfLink': 'link'}
+        self.config['upload'] = {
+            'part_size': 4,
+            'workers': 2,
+            'composite_threshold': 4,
+            }
+        uploads = []
+        interrupt = [True]
+
+        def upload(obj, media, session=None, checkpoint=None):
+            uploads.append((obj.name, dict(session)))
+            if obj.name == 'name.part1' and interrupt[0]:
+                session.update({'uri': 'uri', 'offset': 2, 'size': 4})
+                checkpoint()
+                raise RecoverableError('interrupted')
+            return {'selfLink': obj.name}
+
+        session = {}
+        sessions = []
+
+        def checkpoint():
+            self.assertIs(threading.current_thread(), main_thread)
+            sessions.append(dict(session['parts']))
+
+        main_thread = threading.current_thread()
+        obj = storage.Object(self.config, Mock(), 'name')
+
+        with patch('cloudify_gcp.storage.Object.upload', new=upload):
+            with self.assertRaises(RecoverableError):
+                obj.upload_to_bucket(self.path, session, checkpoint)
+
+            self.assertEqual({'done': True}, session['parts']['0'])
+            self.assertEqual(
+                {'uri': 'uri', 'offset': 2, 'size': 4},
+                session['parts']['1'])
+            # Every update was checkpointed
+            self.assertEqual(session['parts'], sessions[-1])
+            # The finished parts are kept for the retry
+            mock_build().objects().delete.assert_not_called()
+
+            interrupt[0] = False
+            del uploads[:]
+            self.assertEqual(
+                'link', obj.upload_to_bucket(self.path, session))
+
+        uploaded = dict(uploads)
+        self.assertNotIn('name.part0', uploaded)
+        self.assertEqual(
+            {'uri': 'uri', 'offset': 2, 'size': 4}, uploaded['name.part1'])
+        mock_build().objects().delete.assert_any_call(
+            bucket='not really a project', object='name.part0')
+
+    def test_file_part(self, *args):
+        part = storage.FilePart(self.path, 8, 4)
+
+        self.assertEqual(b'89', part.read())
+        part.seek(0, os.SEEK_END)
+        self.assertEqual(2, part.tell())
+        part.seek(1)
+        self.assertEqual(b'9', part.read(4))
+        part.close()
+
+    def test_upload_records_session(self, mock_build, *args):
+        request = mock_build().objects().insert()
+        request.resumable_uri = 'uri'
+        request.resumable_progress = 5
+        request.next_chunk.side_effect = [
+            (Mock(), None),
+            (None, {'selfLink': 'link'}),
+            ]
+        session = {}
+        sessions = []
+        obj = storage.Object(self.config, Mock(), 'name')
+
+        obj.upload_to_bucket(
+            self.path, session, lambda: sessions.append(dict(session)))
+
+        self.assertEqual(
+            [{'uri': 'uri', 'offset': 5, 'size': 10}], sessions)
+
+    def test_upload_resume(self, mock_build, *args):
+        request = mock_build().objects().insert()
+        request.next_chunk.return_value = (None, {'selfLink': 'link'})
+        obj = storage.Object(self.config, Mock(), 'name')
+
+        obj.upload_to_bucket(
+            self.path, {'uri': 'uri', 'offset': 5, 'size': 10})
+
+        self.assertEqual('uri', request.resumable_uri)
+        self.assertEqual(5, request.resumable_progress)
+
+    def test_upload_retries(self, mock_build, *args):
+        request = mock_build().objects().insert()
+        request.resumable_uri = 'uri'
+        request.resumable_progress = 5
+        request.next_chunk.side_effect = [
+            (Mock(), None),
+            HttpError(NS(status=503), 'backend error'),
+            (None, {'selfLink': 'link'}),
+            ]
+        session = {}
+        obj = storage.Object(self.config, Mock(), 'name')
+
+        with self.assertRaises(RecoverableError) as e:
+            obj.upload_to_bucket(self.path, session)
+        self.assertIn('503: backend error', str(e.exception))
+
+        # The retried task resumes from the recorded progress
+        request.resumable_uri = request.resumable_progress = None
+        self.assertEqual('link', obj.upload_to_bucket(self.path, session))
+        self.assertEqual('uri', request.resumable_uri)
+        self.assertEqual(5, request.resumable_progress)
+
+    def test_upload_fails(self, mock_build, *args):
+        mock_build().objects().insert().next_chunk.side_effect = HttpError(
+            NS(status=403), 'forbidden')
+        obj = storage.Object(self.config, Mock(), 'name')
+
+        with self.assertRaises(storage.GCPError) as e:
+            obj.upload_to_bucket(self.path)
+        self.assertIn('403: forbidden', e.exception.message)
+
+    def test_adapt_chunk_size(self, *args):
+        size = 4 * 1024 * 1024
+        self.assertEqual(2 * size, storage.adapt_chunk_size(size, 1))
+        self.assertEqual(size, storage.adapt_chunk_size(size, 10))
+        self.assertEqual(size // 2, storage.adapt_chunk_size(size, 60))
+        self.assertEqual(
+            256 * 1024, storage.adapt_chunk_size(256 * 1024, 60))
+
+    def test_content_md5(self, mock_build, *args):
+        mock_build().objects().get().execute.return_value = {
+            'metadata': {'cloudify-md5': 'digest'}}
+        obj = storage.Object(self.config, Mock(), 'name')
+
+        self.assertEqual('digest', obj.content_md5())
+
+    def test_file_md5(self, *args):
+        self.assertEqual(
+            'eB5eJF1ptWaXm4bijSPyxw==', storage.file_md5(self.path))
+
+
+class TestStreamUpload(unittest.TestCase):
+
+    def test_getbytes(self):
+        media = storage.StreamUpload([b'abc', b'defgh', b'ij'])
+
+        self.assertEqual(b'abcd', media.getbytes(0, 4))
+        # Sent again from part of the way through
+        self.assertEqual(b'cdef', media.getbytes(2, 4))
+        self.assertEqual(b'ghij', media.getbytes(6, 4))
+        self.assertEqual(b'', media.getbytes(10, 4))
+
+    def test_getbytes_resume(self):
+        media = storage.StreamUpload([b'abc', b'defgh', b'ij'])
+
+        self.assertEqual(b'hij', media.getbytes(7, 4))
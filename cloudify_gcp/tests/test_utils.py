@@ -14,6 +14,11 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
+import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
 from functools import partial
 
@@ -97,6 +102,275 @@ class TestUtils(unittest.TestCase):
         self.assertTrue(utils.is_object_deleted(obj))
 
 
+@patch('cloudify_gcp.utils.time.sleep')
+class TestPoller(unittest.TestCase):
+
+    def test_poll(self, mock_sleep):
+        func = Mock(side_effect=[False, False, True])
+
+        self.assertTrue(utils.Poller().poll(func))
+
+        self.assertEqual(3, func.call_count)
+        self.assertEqual(2, mock_sleep.call_count)
+
+    def test_poll_backoff(self, mock_sleep):
+        func = Mock(side_effect=[None] * 5 + ['done'])
+
+        utils.Poller(initial_delay=2, max_delay=10).poll(func)
+
+        delays = [call[0][0] for call in mock_sleep.call_args_list]
+        for delay, maximum in zip(delays, [2, 4, 8, 10, 10]):
+            self.assertTrue(maximum / 2.0 <= delay <= maximum)
+
+    def test_poll_max_requests(self, mock_sleep):
+        func = Mock(return_value=False)
+
+        with self.assertRaises(utils.GCPError):
+            utils.Poller(max_requests=4).poll(func)
+
+        self.assertEqual(4, func.call_count)
+
+    @patch('cloudify_gcp.utils.time.time', side_effect=[0, 5, 11])
+    def test_poll_max_wait(self, mock_time, mock_sleep):
+        func = Mock(return_value=False)
+
+        with self.assertRaises(utils.GCPError):
+            utils.Poller(max_wait=10).poll(func)
+
+        self.assertEqual(2, func.call_count)
+
+    def test_from_config(self, *args):
+        poller = utils.Poller.from_config({
+            'polling': {'max_wait': 7, 'max_requests': 3},
+            })
+
+        self.assertEqual(7, poller.max_wait)
+        self.assertEqual(3, poller.max_requests)
+        self.assertEqual(utils.constants.POLL_INITIAL_DELAY,
+                         poller.initial_delay)
+
+
+class TestOperationStats(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.stats = utils.OperationStats(
+                os.path.join(self.dir, 'sub', 'stats'))
+
+    def response(self, **kwargs):
+        response = {
+            'operationType': 'insert',
+            'targetLink': 'https://compute/projects/p/global/firewalls/fw',
+            'insertTime': '2016-06-13T05:49:10.000-07:00',
+            }
+        response.update(kwargs)
+        return response
+
+    def test_parse_gcp_timestamp(self):
+        for timestamp in [
+                '2016-06-13T05:49:10.468-07:00',
+                '2016-06-13T12:49:10.468Z',
+                '2016-06-13T14:49:10.468+02:00',
+                ]:
+            self.assertEqual(
+                    1465822150.468,
+                    utils.parse_gcp_timestamp(timestamp))
+
+        self.assertIsNone(utils.parse_gcp_timestamp('yesterday'))
+        self.assertIsNone(utils.parse_gcp_timestamp(None))
+
+    def test_key(self):
+        self.assertEqual('firewalls/insert', self.stats.key(self.response()))
+        self.assertIsNone(self.stats.key({}))
+
+    def test_record(self):
+        self.stats.record(
+                self.response(endTime='2016-06-13T05:49:20.000-07:00'))
+        self.assertEqual({'firewalls/insert': 10}, self.stats.load())
+
+        self.stats.record(
+                self.response(endTime='2016-06-13T05:49:30.000-07:00'))
+        self.assertAlmostEqual(13, self.stats.load()['firewalls/insert'])
+
+    def test_record_incomplete(self):
+        self.stats.record(self.response())
+
+        self.assertEqual({}, self.stats.load())
+
+    @patch('cloudify_gcp.utils.time.time', return_value=1465822150 + 4)
+    def test_retry_delay_known(self, *args):
+        self.stats.save({'firewalls/insert': 20})
+
+        self.assertEqual(16, self.stats.retry_delay(self.response()))
+
+    @patch('cloudify_gcp.utils.time.time', return_value=1465822150 + 9)
+    def test_retry_delay_unknown(self, *args):
+        self.assertEqual(9, self.stats.retry_delay(self.response()))
+        self.assertEqual(
+                utils.constants.RETRY_MIN_DELAY,
+                self.stats.retry_delay({}))
+
+    @patch('cloudify_gcp.utils.time.time', return_value=1465822150 + 600)
+    def test_retry_delay_limit(self, *args):
+        self.assertEqual(
+                utils.constants.RETRY_DEFAULT_DELAY,
+                self.stats.retry_delay(self.response()))
+
+
+@patch('cloudify_gcp.utils.GoogleCloudPlatform.discovery')
+class TestOperation(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {'auth': '', 'project': 'project', 'zone': 'zone'}
+
+    def test_has_finished_waits(self, mock_discovery):
+        wait = mock_discovery.zoneOperations().wait
+        wait().execute.return_value = {'status': 'DONE'}
+        operation = utils.response_to_operation(
+                {'name': 'op', 'zone': 'zones/zone'}, self.config, Mock())
+
+        self.assertTrue(operation.has_finished())
+
+        wait.assert_called_with(
+                project='project', zone='zone', operation='op',
+                fields=utils.Operation.FIELDS)
+        mock_discovery.zoneOperations().get.assert_not_called()
+
+    def test_wait_fallback(self, mock_discovery):
+        operations = Mock(spec=['get'])
+        operations.get().execute.return_value = {'status': 'RUNNING'}
+        mock_discovery.globalOperations.return_value = operations
+        operation = utils.response_to_operation(
+                {'name': 'op'}, self.config, Mock())
+
+        self.assertEqual({'status': 'RUNNING'}, operation.wait())
+        self.assertFalse(operation.has_finished())
+
+
+class TestOperationWatcher(unittest.TestCase):
+
+    def operation(self, name):
+        operation = Mock()
+        operation.project = 'project'
+        operation.self_link = 'operations/' + name
+        operation.FIELDS = 'name,selfLink,status'
+        return operation
+
+    def test_get_shares_snapshot(self):
+        watcher = utils.OperationWatcher()
+        first, second = self.operation('first'), self.operation('second')
+        running = {'selfLink': 'operations/first', 'status': 'RUNNING'}
+        aggregated_list = first.discovery.globalOperations().aggregatedList
+        aggregated_list().execute.return_value = {
+            'items': {
+                'zones/zone': {'operations': [running]},
+                'global': {'warning': 'no operations'},
+                }}
+
+        self.assertEqual(running, watcher.get(first))
+        self.assertIs(second.wait(), watcher.get(second))
+
+        aggregated_list.assert_called_with(
+                project='project',
+                filter='status ne DONE',
+                maxResults=500,
+                fields='items/*/operations(name,selfLink,status)')
+        second.discovery.globalOperations.assert_not_called()
+        first.wait.assert_not_called()
+
+    @patch('cloudify_gcp.utils.time.time')
+    def test_get_refreshes(self, mock_time):
+        watcher = utils.OperationWatcher(max_age=5)
+        operation = self.operation('op')
+        execute = operation.discovery.globalOperations(
+                ).aggregatedList().execute
+        execute.return_value = {}
+
+        for now in 100, 104, 106:
+            mock_time.return_value = now
+            watcher.get(operation)
+
+        self.assertEqual(2, execute.call_count)
+
+
+class TestCoalescer(unittest.TestCase):
+
+    def test_sends_alone_straight_away(self):
+        coalescer = utils.Coalescer(window=10)
+        send = Mock(return_value='result')
+        started = time.time()
+
+        self.assertEqual('result', coalescer.submit('key', 1, send))
+
+        self.assertLess(time.time() - started, 5)
+        send.assert_called_once_with([1])
+
+    def test_combines_while_sending(self):
+        coalescer = utils.Coalescer(window=10)
+        sending = threading.Event()
+        release = threading.Event()
+        sent = []
+
+        def send(items):
+            sent.append(items)
+            sending.set()
+            release.wait()
+            return len(items)
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda item=item: results.append(
+                coalescer.submit('key', item, send)))
+            for item in range(3)]
+        threads[0].start()
+        sending.wait()
+        threads[1].start()
+        while not coalescer._pending:
+            time.sleep(0.01)
+        threads[2].start()
+        while len(coalescer._pending['key'].items) < 2:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([[0], [1, 2]], sent)
+        self.assertEqual([1, 2, 2], sorted(results))
+
+    def test_full(self):
+        coalescer = utils.Coalescer(window=10, max_size=2)
+        coalescer._sending['key'] = Mock()
+        send = Mock(return_value='result')
+        results = []
+
+        thread = threading.Thread(target=lambda: results.append(
+            coalescer.submit('key', 1, send)))
+        thread.start()
+        while not coalescer._pending:
+            time.sleep(0.01)
+        results.append(coalescer.submit('key', 2, send))
+        thread.join()
+
+        send.assert_called_once_with([1, 2])
+        self.assertEqual(['result', 'result'], results)
+
+    def test_separate_keys(self):
+        coalescer = utils.Coalescer(window=0)
+        send = Mock()
+
+        coalescer.submit('a', 1, send)
+        coalescer.submit('b', 2, send)
+
+        self.assertEqual(2, send.call_count)
+
+    def test_error(self):
+        coalescer = utils.Coalescer(window=0)
+
+        with self.assertRaises(ValueError):
+            coalescer.submit('key', 1, Mock(side_effect=ValueError))
+
+
 @patch('cloudify_gcp.gcp.ServiceAccountCredentials.from_json_keyfile_dict')
 class TestUtilsWithCTX(unittest.TestCase):
 
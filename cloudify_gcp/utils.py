@@ -13,12 +13,18 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
+import os
 import re
+import json
+import random
 import string
 import time
+import calendar
+import tempfile
+import threading
 from functools import wraps
 from subprocess import check_output
-from os.path import basename, expanduser
+from os.path import basename, dirname, expanduser
 from abc import ABCMeta, abstractmethod
 
 import yaml
@@ -140,18 +146,201 @@ def delete_if_not_external(resource):
         return resource.delete()
 
 
+class PollingTimeout(GCPError):
+    """
+    Raised when a Poller gives up waiting.
+    """
+
+
+class Poller(object):
+    """
+    Repeatedly call a function until its result is acceptable, waiting
+    exponentially longer (with jitter) between each call.
+    """
+
+    def __init__(self,
+                 initial_delay=constants.POLL_INITIAL_DELAY,
+                 max_delay=constants.POLL_MAX_DELAY,
+                 max_wait=constants.POLL_MAX_WAIT,
+                 max_requests=constants.POLL_MAX_REQUESTS,
+                 ):
+        """
+        :param initial_delay: seconds to wait after the first call
+        :param max_delay: longest time (in seconds) to wait between calls
+        :param max_wait: give up after this many seconds
+        :param max_requests: give up after calling the function this many
+        times
+        """
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self.max_requests = max_requests
+
+    @classmethod
+    def from_config(cls, gcp_config):
+        """
+        Create a Poller using any settings in gcp_config's `polling` section
+        """
+        settings = gcp_config.get(constants.POLLING, {})
+        return cls(**{
+            key: settings[key]
+            for key in (
+                'initial_delay', 'max_delay', 'max_wait', 'max_requests')
+            if key in settings})
+
+    def poll(self, func, condition=bool):
+        """
+        Call `func` until `condition(func())` is True.
+
+        :return: the last result of `func`
+        :raise: PollingTimeout if the time or request budget is used up first
+        """
+        deadline = time.time() + self.max_wait
+        delay = self.initial_delay
+        requests = 0
+        while True:
+            result = func()
+            requests += 1
+            if condition(result):
+                return result
+
+            remaining = deadline - time.time()
+            if requests >= self.max_requests or remaining <= 0:
+                raise PollingTimeout(
+                    'Gave up waiting after {0} requests'.format(requests))
+
+            time.sleep(min(random.uniform(delay / 2.0, delay), remaining))
+            delay = min(delay * 2, self.max_delay)
+
+
 def sync_operation(func):
     def _decorator(resource, *args, **kwargs):
         response = func(resource, *args, **kwargs)
         operation = response_to_operation(
             response, resource.config, resource.logger)
-        while not operation.has_finished():
-            time.sleep(1)
+        Poller.from_config(resource.config).poll(operation.has_finished)
         return operation.last_response
 
     return wraps(func)(_decorator)
 
 
+def parse_gcp_timestamp(timestamp):
+    """
+    Convert an RFC 3339 timestamp, as used by the GCP API, to seconds since
+    the epoch.
+
+    :return: the time, or None if `timestamp` isn't in the expected format
+    """
+    if not isinstance(timestamp, basestring):
+        return None
+    match = re.match(
+        r'^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(\.\d+)?'
+        r'(?:Z|([+-])(\d\d):(\d\d))$',
+        timestamp)
+    if not match:
+        return None
+
+    base, fraction, sign, hours, minutes = match.groups()
+    seconds = calendar.timegm(time.strptime(base, '%Y-%m-%dT%H:%M:%S'))
+    if fraction:
+        seconds += float(fraction)
+    if sign:
+        offset = int(hours) * 3600 + int(minutes) * 60
+        seconds += -offset if sign == '+' else offset
+    return seconds
+
+
+class OperationStats(object):
+    """
+    Typical durations of GCP operations, by resource kind and operation type
+    (e.g. 'firewalls/insert').
+
+    These are kept in a small file so that every operation run on this
+    machine can learn from the others.
+    """
+
+    # weight given to each new measurement in the moving average
+    SMOOTHING = 0.3
+
+    def __init__(self, path=constants.OPERATION_STATS_PATH):
+        self.path = expanduser(path)
+
+    @staticmethod
+    def key(response):
+        target = response.get('targetLink')
+        operation_type = response.get('operationType')
+        if not (isinstance(target, basestring) and
+                isinstance(operation_type, basestring)):
+            return None
+        return '{0}/{1}'.format(basename(dirname(target)), operation_type)
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def save(self, stats):
+        # The stats are only a hint, so losing an update to a concurrent
+        # writer is fine, but a partially written file is not.
+        try:
+            if not os.path.isdir(dirname(self.path)):
+                os.makedirs(dirname(self.path))
+            fd, temp_path = tempfile.mkstemp(dir=dirname(self.path))
+            with os.fdopen(fd, 'w') as f:
+                json.dump(stats, f)
+            os.rename(temp_path, self.path)
+        except (IOError, OSError) as e:
+            ctx.logger.debug(
+                'Unable to save operation stats: {0}'.format(e))
+
+    def record(self, response):
+        """
+        Update the typical duration of this kind of operation using a
+        finished operation.
+        """
+        key = self.key(response)
+        start = parse_gcp_timestamp(response.get('insertTime'))
+        end = parse_gcp_timestamp(response.get('endTime'))
+        if key is None or start is None or end is None:
+            return
+
+        stats = self.load()
+        duration = end - start
+        if key in stats:
+            duration = (stats[key] * (1 - self.SMOOTHING) +
+                        duration * self.SMOOTHING)
+        stats[key] = duration
+        self.save(stats)
+
+    def retry_delay(self, response):
+        """
+        How long to wait before checking on the operation again.
+
+        If this kind of operation is known the check is scheduled for when it
+        would typically be done. Otherwise the wait grows with the time the
+        operation has already taken.
+        """
+        elapsed = 0
+        start = parse_gcp_timestamp(response.get('insertTime'))
+        if start is not None:
+            elapsed = max(time.time() - start, 0)
+
+        expected = self.load().get(self.key(response))
+        if expected and expected > elapsed:
+            delay = expected - elapsed
+        else:
+            delay = elapsed
+
+        return int(round(min(
+            max(delay, constants.RETRY_MIN_DELAY),
+            constants.RETRY_DEFAULT_DELAY)))
+
+
+operation_stats = OperationStats()
+
+
 def async_operation(get=False):
     """
     Decorator for node methods which return an Operation
@@ -167,18 +356,19 @@ def async_operation(get=False):
                         response,
                         get_gcp_config(),
                         ctx.logger)
-                response = operation.get()
+                response = operation_watcher.get(operation)
 
                 if response['status'] in ('PENDING', 'RUNNING'):
                     ctx.operation.retry(
                         'Operation not completed yet: {}'.format(
                             response['status']),
-                        constants.RETRY_DEFAULT_DELAY)
+                        operation_stats.retry_delay(response))
                 elif response['status'] == 'DONE':
+                    operation_stats.record(response)
                     for key in '_operation', 'name', 'selfLink':
                         props.pop(key, None)
                     if get:
-                        props.update(self.get())
+                        props.update(self.get(fields=self.FIELDS))
                 else:
                     raise NonRecoverableError(
                             'Unknown status response from operation')
@@ -187,7 +377,9 @@ def async_operation(get=False):
                 # Actually run the method
                 response = func(self, *args, **kwargs)
                 ctx.instance.runtime_properties['_operation'] = response
-                ctx.operation.retry('Operation started')
+                ctx.operation.retry(
+                    'Operation started',
+                    operation_stats.retry_delay(response))
 
         return wraps(func)(wrapper)
     return decorator
@@ -335,52 +527,245 @@ def response_to_operation(response, config, logger):
 
 class Operation(GoogleCloudPlatform):
     __metaclass__ = ABCMeta
+    FIELDS = ('name,selfLink,zone,region,status,error,operationType,'
+              'targetLink,insertTime,endTime')
 
     def __init__(self, config, logger, response):
         super(Operation, self).__init__(config, logger, response['name'])
         for item in ('zone', 'region'):
             if item in response:
                 setattr(self, item, response[item])
+        self.self_link = response.get('selfLink')
         self.last_response = None
         self.last_status = None
 
     def has_finished(self):
         if self.last_status != constants.GCP_OP_DONE:
-            self.get()
+            self.wait()
 
         return self.last_status == constants.GCP_OP_DONE
 
     @check_response
     def get(self):
-        self.last_response = self._get()
+        return self._update(self.get_request())
+
+    @check_response
+    def wait(self):
+        """
+        Get the operation once it is DONE, or the API's wait timeout (about 2
+        minutes) passes, whichever is first.
+
+        Falls back to get() if the API version in use has no wait method.
+        """
+        try:
+            request = self.wait_request()
+        except AttributeError:
+            return self.get()
+        return self._update(request)
+
+    def _update(self, request):
+        self.last_response = request.execute()
         self.last_status = self.last_response['status']
         return self.last_response
 
     @abstractmethod
-    def _get(self): pass
+    def get_request(self): pass
+
+    @abstractmethod
+    def wait_request(self): pass
 
 
 class GlobalOperation(Operation):
-    def _get(self):
+    def get_request(self):
         return self.discovery.globalOperations().get(
             project=self.project,
-            operation=self.name).execute()
+            operation=self.name,
+            fields=self.FIELDS)
+
+    def wait_request(self):
+        return self.discovery.globalOperations().wait(
+            project=self.project,
+            operation=self.name,
+            fields=self.FIELDS)
 
 
 class RegionOperation(Operation):
-    def _get(self):
+    def get_request(self):
         return self.discovery.regionOperations().get(
             project=self.project,
             region=basename(self.region),
-            operation=self.name).execute()
+            operation=self.name,
+            fields=self.FIELDS)
+
+    def wait_request(self):
+        return self.discovery.regionOperations().wait(
+            project=self.project,
+            region=basename(self.region),
+            operation=self.name,
+            fields=self.FIELDS)
 
 
 class ZoneOperation(Operation):
-    def _get(self):
+    def get_request(self):
         return self.discovery.zoneOperations().get(
             project=self.project,
             zone=basename(self.zone),
-            operation=self.name).execute()
+            operation=self.name,
+            fields=self.FIELDS)
+
+    def wait_request(self):
+        return self.discovery.zoneOperations().wait(
+            project=self.project,
+            zone=basename(self.zone),
+            operation=self.name,
+            fields=self.FIELDS)
+
+
+class OperationWatcher(object):
+    """
+    Shares the status of running operations between every task in this
+    process, so that many node instances waiting on operations cost one
+    aggregatedList request per refresh instead of a status request each.
+    """
+
+    def __init__(self, max_age=constants.OPERATION_WATCHER_MAX_AGE):
+        """
+        :param max_age: seconds before a snapshot is refreshed
+        """
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._snapshots = {}
+
+    def get(self, operation):
+        """
+        Get the current state of `operation`.
+
+        While the operation is running it is served from the shared snapshot.
+        Once it is no longer listed there it is requested directly, to get
+        its final state.
+        """
+        response = self._running(operation).get(operation.self_link)
+        if response is None:
+            response = operation.wait()
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+
+    def _running(self, operation):
+        if not operation.self_link:
+            return {}
+
+        # The refresh is done while holding the lock so that concurrent
+        # tasks wait for a single request instead of each making their own.
+        with self._lock:
+            taken, running = self._snapshots.get(
+                operation.project, (0, None))
+            if running is None or time.time() - taken > self.max_age:
+                running = self._list_running(operation)
+                self._snapshots[operation.project] = (time.time(), running)
+        return running
+
+    @staticmethod
+    def _list_running(operation):
+        """
+        One page is enough: any operation which doesn't appear in the
+        snapshot is simply looked up directly.
+        """
+        response = operation.discovery.globalOperations().aggregatedList(
+            project=operation.project,
+            filter='status ne DONE',
+            maxResults=constants.MAX_RESULTS,
+            fields='items/*/operations({0})'.format(operation.FIELDS),
+            ).execute()
+
+        running = {}
+        for scope in response.get('items', {}).values():
+            for item in scope.get('operations', []):
+                running[item['selfLink']] = item
+        return running
+
+
+operation_watcher = OperationWatcher()
+
+
+class Coalescer(object):
+    """
+    Combines requests made by tasks running concurrently in this process.
+
+    Items submitted under the same key are collected into one batch. A task
+    whose item starts a batch sends it straight away if no batch for that
+    key is being sent. Otherwise items collect until that send finishes (or
+    for up to `window` seconds, or until there are `max_size` items), and
+    the task sends the whole batch on behalf of all of them. Every
+    submitter gets the batch's result, or has its exception raised.
+    """
+
+    def __init__(self,
+                 window=constants.COALESCE_WINDOW,
+                 max_size=constants.MAX_BATCH_SIZE):
+        self.window = window
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._sending = {}
+
+    def submit(self, key, item, send):
+        """
+        Add `item` to the batch for `key`.
+
+        :param send: function called with the list of items in the batch,
+        once, by whichever task created the batch
+        :return: what `send` returned
+        """
+        with self._lock:
+            batch = self._pending.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._pending[key] = _Batch()
+                busy = key in self._sending
+            batch.items.append(item)
+            if len(batch.items) >= self.max_size:
+                del self._pending[key]
+                batch.ready.set()
+
+        if leader:
+            if busy:
+                batch.ready.wait(self.window)
+            with self._lock:
+                if self._pending.get(key) is batch:
+                    del self._pending[key]
+                self._sending[key] = batch
+            try:
+                batch.result = send(batch.items)
+            except Exception as e:
+                batch.error = e
+            finally:
+                with self._lock:
+                    if self._sending.get(key) is batch:
+                        del self._sending[key]
+                    # Items which collected while this was sent go next
+                    following = self._pending.get(key)
+                    if following is not None:
+                        following.ready.set()
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.result
+
+
+class _Batch(object):
+
+    def __init__(self):
+        self.items = []
+        self.ready = threading.Event()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
 
 
 def get_relationships(
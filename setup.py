@@ -28,6 +28,9 @@ setup(
         'cloudify_gcp.compute',
         'cloudify_gcp.dns',
         ],
+    package_data={
+        'cloudify_gcp': ['discovery/*.json'],
+        },
 
     license='LICENSE',
     zip_safe=False,